@@ -3,29 +3,51 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import csv
+import io
 import json
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, jsonify, stream_with_context, abort
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
+from routing import RoutingSQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from flask_wtf import Form
 from forms import *
-from flask_migrate import Migrate
-import sys
+from pagination import keyset_page, keyset_query, page_size
+from streaming import EXPORT_FORMATS, export_chunks, stream_json_page
+from search import NameIndex, PrefixIndex, search_by_name
+from assets import Assets
+from cache import ResponseCache
+from conditional import ConditionalGet
+from templating import TemplateCache
+from instrumentation import SQLInstrumentation
+from dateformat import DateTimeFormatter
+from logs import QueueLogging
+import os
 import datetime
+import click
+from itertools import groupby, islice
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+# The extensions are bound to the app by create_app(), at the end.
+moment = Moment()
+db = RoutingSQLAlchemy()
+page_cache = ResponseCache()
+assets = Assets()
+templates = TemplateCache()
+conditional = ConditionalGet(db=db)
+sql_stats = SQLInstrumentation()
+dates = DateTimeFormatter()
+logs = QueueLogging()
 
-migrate = Migrate(app, db)
+main_views = Blueprint('main', __name__)
+venue_views = Blueprint('venues', __name__)
+artist_views = Blueprint('artists', __name__)
+show_views = Blueprint('shows', __name__)
+commands = Blueprint('commands', __name__, cli_group=None)
 
 
 #----------------------------------------------------------------------------#
@@ -33,230 +55,785 @@ migrate = Migrate(app, db)
 #----------------------------------------------------------------------------#
 
 
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_time', 'venue_id', 'time'),
+        db.Index('ix_show_artist_id_time', 'artist_id', 'time'),
+        db.Index('ix_show_time_id', 'time', 'id'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    time = db.Column(db.String(20))
+    time = db.Column(db.DateTime, nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'))
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'))
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     venue = db.relationship("Venue", back_populates="show")
     artist = db.relationship("Artist", back_populates="show")
 
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name',
+                 postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # The listing is ordered and paged by state, city and name.
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=venue_genre, order_by='Genre.name')
     website = db.Column(db.String(200))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    show = db.relationship("Show", back_populates="venue")
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    show = db.relationship("Show", back_populates="venue", order_by="Show.time")
 
 
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name',
+                 postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    # The listing is ordered and paged by name.
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genre, order_by='Genre.name')
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(200))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    show = db.relationship('Show', back_populates="artist")
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    show = db.relationship('Show', back_populates="artist", order_by="Show.time")
 
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+class ShowCountRollover(db.Model):
+    """Single row holding the time of the last rollover_show_counts()."""
+    __tablename__ = 'show_count_rollover'
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+
+# Names are unique ignoring case. The create routes rely on these indexes
+# instead of checking first, see create_unique().
+db.Index('ix_venue_lower_name', db.func.lower(Venue.name), unique=True)
+db.Index('ix_artist_lower_name', db.func.lower(Artist.name), unique=True)
+
+
+def touch(mapper, connection, target):
+    # onupdate only fires when a column changes, a new list of genres
+    # alone issues no UPDATE of the row.
+    if db.object_session(target).is_modified(target):
+        target.updated_at = datetime.datetime.utcnow()
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+for model in (Venue, Artist, Show):
+    db.event.listen(model, 'before_update', touch)
+
+# In-process name search indexes, used when the database is not Postgres.
+venue_names = NameIndex(Venue)
+artist_names = NameIndex(Artist)
+
+# In-process prefix indexes for autocompletion.
+venue_prefixes = PrefixIndex(Venue)
+artist_prefixes = PrefixIndex(Artist)
 
 #----------------------------------------------------------------------------#
-# Controllers.
+# Queries.
 #----------------------------------------------------------------------------#
 
+def insert_or_ignore(table):
+    """``INSERT ... ON CONFLICT DO NOTHING`` into ``table``, or ``None`` when
+    the database has no such statement."""
+    dialect = db.session.connection().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return None
+
+
+def create_unique(model, values):
+    """Insert a ``model`` row from ``values`` unless one with the same name
+    (ignoring case) exists. Returns the new id, or ``None`` if the name is
+    taken.
+
+    The check is the unique index itself, so concurrent submissions of the
+    same name cannot both get in.
+    """
+    table = model.__table__
+    statement = insert_or_ignore(table)
+    if statement is None:
+        try:
+            with db.session.begin_nested():
+                return db.session.execute(table.insert().values(**values)).inserted_primary_key[0]
+        except IntegrityError:
+            return None
+    result = db.session.execute(statement.values(**values))
+    return result.inserted_primary_key[0] if result.rowcount else None
+
+
+def get_genres(names):
+    """Return the Genre rows for ``names``, creating the ones that are new."""
+    names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+    if not names:
+        return []
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    known = {genre.name for genre in genres}
+    missing = [name for name in names if name not in known]
+    if missing:
+        # Another request may be adding the same genre, let the unique
+        # constraint sort it out and read back whatever won.
+        statement = insert_or_ignore(Genre.__table__)
+        if statement is None:
+            for name in missing:
+                create_unique(Genre, {'name': name})
+        else:
+            db.session.execute(statement, [{'name': name} for name in missing])
+        genres.extend(Genre.query.filter(Genre.name.in_(missing)))
+    return genres
+
+
+def link_genres(association, owner_column, owner_id, genres):
+    if genres:
+        db.session.execute(association.insert(),
+                           [{owner_column: owner_id, 'genre_id': genre.id} for genre in genres])
+
+
+# Venues and artists keep the number of their upcoming and past shows. A
+# new show is added to the counts of its venue and artist in the
+# transaction inserting it, and deleting shows recounts their venues and
+# artists. As time passes, shows that were upcoming have started:
+# rollover_show_counts(), run on a schedule, recounts the venues and artists
+# of the shows that started since it last ran. Until then their counts may
+# be behind by those shows.
+
+# Owner model: its column in the show table.
+SHOW_OWNERS = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+
+def count_new_shows(shows, now=None):
+    """Add ``shows``, mappings with the ``venue_id``, ``artist_id`` and
+    ``time`` of shows just inserted, to the counts of their venues and
+    artists. One UPDATE per table."""
+    now = now or datetime.datetime.utcnow()
+    for model, column in SHOW_OWNERS:
+        counts = {}
+        for show in shows:
+            if show['time'] is None:
+                continue
+            upcoming, past = counts.get(show[column], (0, 0))
+            counts[show[column]] = (upcoming + 1, past) if show['time'] > now else (upcoming, past + 1)
+        if not counts:
+            continue
+        table = model.__table__
+        db.session.execute(table.update().where(table.c.id == db.bindparam('owner_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('upcoming'),
+            past_shows_count=table.c.past_shows_count + db.bindparam('past')),
+            [{'owner_id': int(id), 'upcoming': upcoming, 'past': past}
+             for id, (upcoming, past) in counts.items()])
+
+
+def exact_show_counts(model, column, now):
+    """Correlated subqueries counting the upcoming and past shows of a row
+    of ``model``."""
+    table = model.__table__
+    shows = Show.__table__
+
+    def count(condition):
+        return db.select(db.func.count(shows.c.id)).where(
+            shows.c[column] == table.c.id, condition).scalar_subquery()
+    return count(shows.c.time > now), count(shows.c.time <= now)
+
+
+def recount_shows(model, column, ids=None, now=None):
+    """Set the show counts of the ``model`` rows with ``ids`` (a list or a
+    select, all rows by default) from their shows. Returns the number of
+    rows updated."""
+    table = model.__table__
+    upcoming, past = exact_show_counts(model, column, now or datetime.datetime.utcnow())
+    statement = table.update().values(upcoming_shows_count=upcoming, past_shows_count=past)
+    if ids is not None:
+        statement = statement.where(table.c.id.in_(ids))
+    return db.session.execute(statement).rowcount
+
+
+def rollover_show_counts(now=None):
+    """Recount the venues and artists with shows that started since the
+    last rollover (or ever, the first time) and commit. Returns the number
+    of rows updated."""
+    now = now or datetime.datetime.utcnow()
+    state = db.session.get(ShowCountRollover, 1)
+    started = Show.time <= now
+    if state is None:
+        state = ShowCountRollover(id=1)
+        db.session.add(state)
+    else:
+        started = db.and_(started, Show.time > state.rolled_over_at)
+
+    updated = 0
+    for model, column in SHOW_OWNERS:
+        updated += recount_shows(model, column, db.select(getattr(Show, column)).where(started), now)
+    state.rolled_over_at = now
+    db.session.commit()
+    return updated
+
+
+def show_count_mismatches(model, column, now):
+    """Query for the ``model`` rows whose counts differ from their shows,
+    as ``(id, upcoming_shows_count, past_shows_count, upcoming, past)``."""
+    upcoming, past = exact_show_counts(model, column, now)
+    table = model.__table__
+    return db.select(table.c.id, table.c.upcoming_shows_count, table.c.past_shows_count,
+                     upcoming.label('upcoming'), past.label('past')).where(db.or_(
+        table.c.upcoming_shows_count != upcoming, table.c.past_shows_count != past)).order_by(table.c.id)
+
+
+def venue_artist_ids(venue_id):
+    return [artist_id for artist_id, in
+            db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+
+def venue_page_tags(venue_id, artist_ids=None):
+    """Cache tags of every page that renders data of the venue, whose shows
+    are by ``artist_ids`` (queried by default)."""
+    if artist_ids is None:
+        artist_ids = venue_artist_ids(venue_id)
+    return ['venues', 'shows', f'venue:{venue_id}'] + [f'artist:{artist_id}' for artist_id in artist_ids]
+
+
+def artist_page_tags(artist_id):
+    """Cache tags of every page that renders data of the artist."""
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return ['artists', 'shows', f'artist:{artist_id}'] + [f'venue:{venue_id}' for venue_id, in venue_ids]
+
+
+def parse_time(value):
+    """The naive UTC timestamp of a time string. Raises ``ValueError`` for
+    anything but a string: dateutil reads a number as a day of the current
+    month."""
+    if not isinstance(value, str):
+        raise ValueError('start_time is not a string: {!r}'.format(value))
+    time = dateutil.parser.parse(value)
+    # Show.time is a naive UTC timestamp.
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return time
+
+
+def parse_id(value):
+    value = str(value if value is not None else '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def validate_shows(records):
+    """Check ``(row, record)`` pairs, records with the ``artist_id``,
+    ``venue_id`` and ``start_time`` of new shows, and return the rows to
+    insert and the ``(row, message)`` errors. The ids are checked with one
+    ``IN`` query per table."""
+    rows, errors = [], []
+    parsed = []
+    for row, record in records:
+        artist_id, venue_id = parse_id(record.get('artist_id')), parse_id(record.get('venue_id'))
+        if artist_id is None:
+            errors.append((row, 'invalid artist_id'))
+            continue
+        if venue_id is None:
+            errors.append((row, 'invalid venue_id'))
+            continue
+        try:
+            time = parse_time(record.get('start_time'))
+        except (ValueError, OverflowError):
+            errors.append((row, 'invalid start_time'))
+            continue
+        parsed.append((row, {'artist_id': artist_id, 'venue_id': venue_id, 'time': time}))
+
+    known = {}
+    for model, column in SHOW_OWNERS:
+        ids = {show[column] for _, show in parsed}
+        known[column] = {id for id, in db.session.query(model.id).filter(
+            model.id.in_(list(ids)))} if ids else set()
+
+    seen = {}
+    for row, show in parsed:
+        key = (show['venue_id'], show['artist_id'], show['time'])
+        if show['artist_id'] not in known['artist_id']:
+            errors.append((row, 'unknown artist {}'.format(show['artist_id'])))
+        elif show['venue_id'] not in known['venue_id']:
+            errors.append((row, 'unknown venue {}'.format(show['venue_id'])))
+        elif key in seen:
+            errors.append((row, 'same show as row {}'.format(seen[key])))
+        else:
+            seen[key] = row
+            rows.append(show)
+    errors.sort(key=lambda error: error[0])
+    return rows, errors
+
+
+def insert_shows(rows, batch_size):
+    """Insert ``rows`` with multi-row INSERTs of ``batch_size`` rows, and
+    count them, in the session's transaction."""
+    table = Show.__table__
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert().values(rows[start:start + batch_size]))
+    count_new_shows(rows)
+
+
+def export_query(table):
+    """Rows of ``table`` ('venues', 'artists' or 'shows') for a full dump,
+    in id order and read through a server-side cursor. Shows carry the
+    venue and artist names."""
+    if table == 'venues':
+        query = db.session.query(*Venue.__table__.columns).order_by(Venue.id)
+    elif table == 'artists':
+        query = db.session.query(*Artist.__table__.columns).order_by(Artist.id)
+    else:
+        query = db.session.query(
+            Show.id, Show.time.label('start_time'),
+            Show.venue_id, Venue.name.label('venue_name'),
+            Show.artist_id, Artist.name.label('artist_name')
+        ).join(Venue, Show.venue_id == Venue.id).join(
+            Artist, Show.artist_id == Artist.id).order_by(Show.id)
+    columns = [column['name'] for column in query.column_descriptions]
+    return query.yield_per(current_app.config['EXPORT_YIELD_PER']), columns
+
+
+# Versions of the pages, for their ETag and Last-Modified (see
+# conditional.py). Besides the updated_at of what a page shows, pages
+# splitting shows into past and upcoming depend on the start of the latest
+# show that has begun: they change when it moves, not only on writes.
+
+def newest(*values):
+    return max((value for value in values if isinstance(value, datetime.datetime)), default=None)
+
+
+def started(now):
+    return db.func.max(db.case((Show.time <= now, Show.time)))
+
+
+def venue_version(session, venue_id):
+    """The venue, its shows and their artists."""
+    row = session.execute(db.select(
+        Venue.updated_at,
+        db.func.max(Show.updated_at),
+        db.func.max(Artist.updated_at),
+        started(datetime.datetime.utcnow())
+    ).select_from(Venue).outerjoin(Show, Show.venue_id == Venue.id).outerjoin(
+        Artist, Artist.id == Show.artist_id).filter(Venue.id == venue_id).group_by(
+        Venue.id, Venue.updated_at)).first()
+    return None if row is None else (newest(*row), tuple(row))
+
+
+def artist_version(session, artist_id):
+    """The artist, its shows and their venues."""
+    row = session.execute(db.select(
+        Artist.updated_at,
+        db.func.max(Show.updated_at),
+        db.func.max(Venue.updated_at),
+        started(datetime.datetime.utcnow())
+    ).select_from(Artist).outerjoin(Show, Show.artist_id == Artist.id).outerjoin(
+        Venue, Venue.id == Show.venue_id).filter(Artist.id == artist_id).group_by(
+        Artist.id, Artist.updated_at)).first()
+    return None if row is None else (newest(*row), tuple(row))
+
+
+def listing_version(*models):
+    """Version function of the pages listing ``models``: the newest
+    updated_at of each, and the number of venues, which are the only rows
+    ever deleted (shows go with them). The show counts of the venue listing
+    are columns of the venues, updated with them."""
+    def version(session):
+        values = [db.select(db.func.max(model.updated_at)).scalar_subquery() for model in models]
+        values.append(db.select(db.func.count(Venue.id)).scalar_subquery())
+        row = tuple(session.execute(db.select(*values)).one())
+        return newest(*row), row
+    return version
+
+
+venues_version = listing_version(Venue)
+artists_version = listing_version(Artist)
+shows_version = listing_version(Show, Venue, Artist)
+api_venues_version = venues_version
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
 
-#  Venues
-#  ----------------------------------------------------------------
+# Template context of the read-only pages. They take the session to query
+# so that asgi.py can run them on an async session (through run_sync) as
+# well as the views below on db.session.
 
-@app.route('/venues')
-def venues():
+def venues_page(session):
+    venues = session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'))
 
-    data = []
-    
-    try:
-        venues = Venue.query.order_by(Venue.city).all()
-        data = []
-
-        for venue in venues:
-            data.append({
-                "city": venue.city,
-                "state": venue.state,
-                "venues": [{
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": Show.query.filter(Show.venue_id == venue.id).count(),
-                }]
-            })
-    except:
-        db.session.rollback()
+    genre = request.args.get('genre')
+    if genre:
+        venues = venues.join(venue_genre).join(Genre).filter(Genre.name == genre)
 
-    finally:
-        db.session.close()
+    venues, next_cursor = keyset_page(
+        venues,
+        (Venue.state, Venue.city, Venue.name, Venue.id),
+        after=request.args.get('after'))
 
-    return render_template('pages/venues.html', areas=data)
+    data = []
+    for (city, state), area in groupby(venues, key=lambda venue: (venue.city, venue.state)):
+        data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in area]
+        })
 
+    return {'areas': data, 'next_cursor': next_cursor}
 
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
 
+def search_venues_page(session):
     search_by = request.form.get('search_term')
-    search_result = Venue.query.filter(
-        Venue.name.ilike(f'%{search_by}%')).all()
+    search_result = search_by_name(
+        session.query(
+            Venue.id,
+            Venue.name,
+            Venue.upcoming_shows_count.label('num_upcoming_shows')),
+        Venue, search_by, venue_names, current_app.config['SEARCH_RESULTS_LIMIT'])
     response = []
 
     for result in search_result:
         response.append({
             "id": result.id,
             "name": result.name,
-            "num_upcoming_shows": Show.query.filter(Show.venue_id == result.id).count(),
+            "num_upcoming_shows": result.num_upcoming_shows,
         })
 
-    return render_template('pages/search_venues.html',
-                           results=response,
-                           number=len(search_result),
-                           search_by=search_by)
+    return {'results': response, 'number': len(search_result), 'search_by': search_by}
 
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-
-    venue = Venue.query.filter(Venue.id == venue_id).first()
+def split_shows(shows, entry):
+    """Split ``shows`` into past and upcoming, as ``entry(show, start_time)``."""
     current_time = datetime.datetime.utcnow()
-    show = Show.query.filter(Show.venue_id == venue_id).all()
-    show_past = Show.query.filter(
-        Show.venue_id == venue_id).filter(Show.time < current_time)
-    show_future = Show.query.filter(
-        Show.venue_id == venue_id).filter(Show.time > current_time)
 
     past_shows = []
     future_shows = []
 
-    for show in show_past:
-        artist = Artist.query.get(show.artist_id)
+    start_times = dates.format_many([show.time for show in shows], 'full')
 
-        past_shows.append({
-            "artist_id": show.artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
-            "start_time": (show.time).strftime("%m/%d/%Y, %H:%M")
+    for show, start_time in zip(shows, start_times):
+        if show.time < current_time:
+            past_shows.append(entry(show, start_time))
+        else:
+            future_shows.append(entry(show, start_time))
+
+    return {
+      "past_shows": past_shows,
+      "upcoming_shows": future_shows,
+      "past_shows_count": len(past_shows),
+      "upcoming_shows_count": len(future_shows)
+    }
+
+
+def venue_page(session, venue_id):
+    # One joined query loads the venue, its shows and each show's artist.
+    venue = session.query(Venue).options(
+        db.joinedload(Venue.show).joinedload(Show.artist),
+        db.selectinload(Venue.genres)
+    ).filter(Venue.id == venue_id).first()
+    if venue is None:
+        abort(404)
+
+    show_data = split_shows(venue.show, lambda show, start_time: {
+        "artist_id": show.artist_id,
+        "artist_name": show.artist.name,
+        "artist_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
+        "start_time": start_time
+    })
+
+    return {'venue': venue, 'show': show_data}
+
+
+def artists_page(session):
+    artists = session.query(Artist.id, Artist.name)
+
+    genre = request.args.get('genre')
+    if genre:
+        artists = artists.join(artist_genre).join(Genre).filter(Genre.name == genre)
+
+    artists, next_cursor = keyset_page(
+        artists,
+        (Artist.name, Artist.id),
+        after=request.args.get('after'))
+    data = []
+
+    for artist in artists:
+        data.append({
+            "id": artist.id,
+            "name": artist.name,
         })
 
-    for show in show_future:
-        artist = Artist.query.get(show.artist_id)
+    return {'artists': data, 'next_cursor': next_cursor}
 
-        future_shows.append({
-            "artist_id": show.artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
-            "start_time": (show.time).strftime("%m/%d/%Y, %H:%M")
+
+def search_artists_page(session):
+    search_by = request.form.get('search_term')
+    search_result = search_by_name(
+        session.query(
+            Artist.id,
+            Artist.name,
+            Artist.upcoming_shows_count.label('num_upcoming_shows')),
+        Artist, search_by, artist_names, current_app.config['SEARCH_RESULTS_LIMIT'])
+    response = []
+
+    for result in search_result:
+        response.append({
+            "id": result.id,
+            "name": result.name,
+            "num_upcoming_shows": result.num_upcoming_shows,
         })
 
-    show_data = {
-      "past_shows": past_shows,
-      "upcoming_shows": future_shows,
-      "past_shows_count": show_past.count(),
-      "upcoming_shows_count": show_future.count()
-    }
+    return {'results': response, 'number': len(search_result), 'search_term': search_by}
+
+
+def artist_page(session, artist_id):
+    # One joined query loads the artist, its shows and each show's venue.
+    artist = session.query(Artist).options(
+        db.joinedload(Artist.show).joinedload(Show.venue),
+        db.selectinload(Artist.genres)
+    ).filter(Artist.id == artist_id).first()
+    if artist is None:
+        abort(404)
+
+    show_data = split_shows(artist.show, lambda show, start_time: {
+        "venue_id": show.venue_id,
+        "venue_name": show.venue.name,
+        "venue_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
+        "start_time": start_time
+    })
+
+    return {'artist': artist, 'shows': show_data}
+
+
+def shows_page(session):
+    show, next_cursor = keyset_page(
+        session.query(Show).options(db.joinedload(Show.venue), db.joinedload(Show.artist)),
+        (Show.time, Show.id),
+        after=request.args.get('after'))
+
+    data = []
+
+    start_times = dates.format_many([result.time for result in show], 'full')
+
+    for result, start_time in zip(show, start_times):
+        data.append({
+            "venue_id": result.venue_id,
+            "venue_name": result.venue.name,
+            "artist_id": result.artist_id,
+            "artist_name": result.artist.name,
+            "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+            "start_time": start_time
+        })
+
+    return {'shows': data, 'next_cursor': next_cursor}
+
+
+def api_venues_query():
+    columns = (Venue.id,)
+    query = keyset_query(db.select(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.address,
+        Venue.phone, Venue.website, Venue.facebook_link, Venue.image_link,
+        Venue.seeking_talent, Venue.seeking_description
+    ), columns, request.args.get('after'))
+    return query, columns, lambda venue: venue._asdict()
+
+
+def api_artists_query():
+    columns = (Artist.id,)
+    query = keyset_query(db.select(
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+        Artist.website, Artist.facebook_link, Artist.image_link,
+        Artist.seeking_venue, Artist.seeking_description
+    ), columns, request.args.get('after'))
+    return query, columns, lambda artist: artist._asdict()
+
+
+def api_shows_query():
+    columns = (Show.time, Show.id)
+    query = keyset_query(db.select(
+        Show.id, Show.time, Show.venue_id, Venue.name.label('venue_name'),
+        Show.artist_id, Artist.name.label('artist_name')
+    ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id),
+        columns, request.args.get('after'))
+
+    def serialize(show):
+        return {
+            "id": show.id,
+            "start_time": show.time.isoformat() if show.time else None,
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+        }
+
+    return query, columns, serialize
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+@main_views.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+    return dates.format(value, format)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
 
-    return render_template('pages/show_venue.html',
-                           venue=venue,
-                           show=show_data)
+@main_views.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@venue_views.route('/venues')
+@db.reads_from_replica
+@conditional.versioned(venues_version)
+@page_cache.cached('venues')
+def venues():
+    return render_template('pages/venues.html', **venues_page(db.session))
+
+
+@venue_views.route('/venues/search', methods=['POST'])
+@db.reads_from_replica
+def search_venues():
+    return render_template('pages/search_venues.html', **search_venues_page(db.session))
+
+
+@venue_views.route('/venues/<int:venue_id>')
+@db.reads_from_replica
+@conditional.versioned(venue_version)
+@page_cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+    return render_template('pages/show_venue.html', **venue_page(db.session, venue_id))
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+@venue_views.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
 
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@venue_views.route('/venues/create', methods=['POST'])
 def create_venue_submission():
 
     venue_form = VenueForm(request.form)
 
-    venue = Venue(
-        name=venue_form.name.data,
-        city=venue_form.city.data,
-        state=venue_form.state.data,
-        address=venue_form.address.data,
-        phone=venue_form.phone.data,
-        # image_link= request.form['image_link'],
-        genres=", ".join(venue_form.genres.data),
-        facebook_link=venue_form.facebook_link.data,
-    )
     try:
-        number = Venue.query.filter(Venue.name == venue.name).count()
-
-        if number == 0:
-            db.session.add(venue)
+        venue_id = create_unique(Venue, dict(
+            name=venue_form.name.data.strip(),
+            city=venue_form.city.data,
+            state=venue_form.state.data,
+            address=venue_form.address.data,
+            phone=venue_form.phone.data,
+            # image_link= request.form['image_link'],
+            facebook_link=venue_form.facebook_link.data,
+        ))
+
+        if venue_id is not None:
+            link_genres(venue_genre, 'venue_id', venue_id, get_genres(venue_form.genres.data))
             db.session.commit()
+            venue_names.update(venue_id, venue_form.name.data)
+            venue_prefixes.update(venue_id, venue_form.name.data)
+            page_cache.invalidate('venues')
             flash(f'Venue was {venue_form.name.data} successfully listed!')
         else:
+            db.session.rollback()
             flash(
                 f'This venue is already listed {venue_form.name.data}, please try again')
     except:
         db.session.rollback()
-        print('DB rollback')
-        print(sys.exc_info())
+        current_app.logger.exception('Could not create venue %r', venue_form.name.data)
         flash(
             f'There was a problem recording the venue {venue_form.name.data}, please try again')
     finally:
-        print('db closed')
+        current_app.logger.debug('Session closed')
         db.session.close()
 
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+@venue_views.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     venue = Venue.query.get(venue_id)
 
     try:
+      artist_ids = venue_artist_ids(venue.id)
+      tags = venue_page_tags(venue.id, artist_ids)
       Show.query.filter(Show.venue_id == venue.id).delete()
+      # The artists lose these shows. Recounting them also bumps their
+      # updated_at, which the deleted shows cannot.
+      recount_shows(Artist, 'artist_id', artist_ids)
       db.session.delete(venue)
       db.session.commit()
+      page_cache.invalidate(*tags)
     except:
       db.session.rollback()
+      current_app.logger.exception('Could not delete venue %s', venue_id)
     finally:
       db.session.close()
 
@@ -264,94 +841,30 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@artist_views.route('/artists')
+@db.reads_from_replica
+@conditional.versioned(artists_version)
+@page_cache.cached('artists')
 def artists():
-    artists = Artist.query.order_by(Artist.city).all()
-    data = []
+    return render_template('pages/artists.html', **artists_page(db.session))
 
-    for artist in artists:
-        data.append({
-            "id": artist.id,
-            "name": artist.name,
-        })
-
-
-    return render_template('pages/artists.html', artists=data)
 
-
-@app.route('/artists/search', methods=['POST'])
+@artist_views.route('/artists/search', methods=['POST'])
+@db.reads_from_replica
 def search_artists():
-
-    search_by = request.form.get('search_term')
-    search_result = Artist.query.filter(
-        Artist.name.ilike(f'%{search_by}%')).all()
-    response = []
-
-    for result in search_result:
-        response.append({
-            "id": result.id,
-            "name": result.name, 
-            "num_upcoming_shows": Show.query.filter(Show.artist_id == result.id).count(),
-        })
-
-    return render_template('pages/search_artists.html',
-                           results=response,
-                           number=len(search_result),
-                           search_term=search_by)
+    return render_template('pages/search_artists.html', **search_artists_page(db.session))
 
 
-@app.route('/artists/<int:artist_id>')
+@artist_views.route('/artists/<int:artist_id>')
+@db.reads_from_replica
+@conditional.versioned(artist_version)
+@page_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
-
-
-    artist = Artist.query.filter(Artist.id == artist_id).first()
-    show = Show.query.filter(Show.artist_id == artist_id)
-    print('artist', artist)
-    print(artist.name)
-
-    show_data = []
-
-    current_time = datetime.datetime.utcnow()
-    show = Show.query.filter(Show.artist_id == artist_id).all()
-    show_past = Show.query.filter(Show.artist_id == artist_id).filter(Show.time < current_time)
-    show_future = Show.query.filter(Show.artist_id == artist_id).filter(Show.time > current_time)
-
-    past_shows = []
-    future_shows = []
-
-    for show in show_past:
-        venue = Venue.query.get(show.venue_id)
-        past_shows.append({
-            "artist_id": show.venue_id,
-            "venue_name": venue.name,
-            "venue_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
-            "start_time": (show.time).strftime("%m/%d/%Y, %H:%M")
-        })
-
-    for show in show_future:
-        venue = Venue.query.get(show.venue_id)
-        future_shows.append({
-            "artist_id": show.venue_id,
-            "venue_name": venue.name,
-            "venue_image_link": "https://www.freedigitalphotos.net/images/img/homepage/394230.jpg",
-            "start_time": (show.time).strftime("%m/%d/%Y, %H:%M")
-        })
-
-    show_data = {
-      "past_shows": past_shows,
-      "upcoming_shows": future_shows,
-      "past_shows_count": show_past.count(),
-      "upcoming_shows_count": show_future.count()
-    }
-
-   
-    return render_template('pages/show_artist.html',
-                           artist=artist,
-                           shows=show_data)
+    return render_template('pages/show_artist.html', **artist_page(db.session, artist_id))
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@artist_views.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
@@ -359,7 +872,7 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@artist_views.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     form_artist = ArtistForm(request.form)
 
@@ -367,7 +880,7 @@ def edit_artist_submission(artist_id):
       artist = Artist.query.get(artist_id)
      
       artist.name= form_artist.name.data
-      artist.genres = ", ".join(form_artist.genres.data)
+      artist.genres = get_genres(form_artist.genres.data)
       artist.city = form_artist.city.data
       artist.state = form_artist.state.data
       artist.phone = form_artist.phone.data
@@ -377,20 +890,21 @@ def edit_artist_submission(artist_id):
     #   artist.seeking_description = form_artist.seeking_description.data,
     #   artsit.image_link = form_artist.image_link.data
     
+      tags = artist_page_tags(artist_id)
       db.session.commit()
+      page_cache.invalidate(*tags)
     except:
       db.session.rollback()
-      print('DB rollback')
-      print(sys.exc_info())
+      current_app.logger.exception('Could not update artist %s', artist_id)
       flash(f'There was a problem updating the Artist {request.form["name"]}, please try again')
     finally:
-      print('db closed')
+      current_app.logger.debug('Session closed')
       db.session.close()
     
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@venue_views.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
@@ -398,7 +912,7 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@venue_views.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     form_venue = VenueForm(request.form)
 
@@ -406,7 +920,7 @@ def edit_venue_submission(venue_id):
       venue = Venue.query.get(venue_id)
      
       venue.name= form_venue.name.data
-      venue.genres = ", ".join(form_venue.genres.data)
+      venue.genres = get_genres(form_venue.genres.data)
       venue.address = form_venue.address.data
       venue.city = form_venue.city.data
       venue.state = form_venue.state.data
@@ -417,60 +931,62 @@ def edit_venue_submission(venue_id):
     #   venue.seeking_description = form_venue.seeking_description.data,
     #   venue.image_link = form_venue.image_link.data
     
+      tags = venue_page_tags(venue_id)
       db.session.commit()
+      page_cache.invalidate(*tags)
     except:
       db.session.rollback()
-      print('DB rollback')
-      print(sys.exc_info())
+      current_app.logger.exception('Could not update venue %s', venue_id)
       flash(f'There was a problem updating the Venue {request.form["name"]}, please try again')
     finally:
-      print('db closed')
+      current_app.logger.debug('Session closed')
       db.session.close()
 
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@artist_views.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@artist_views.route('/artists/create', methods=['POST'])
 def create_artist_submission():
 
-    artist = Artist(
-        name=request.form['name'],
-        city=request.form['city'],
-        state=request.form['state'],
-        phone=request.form['phone'],
-        # image_link= request.form['image_link'],
-        genres=", ".join(request.form['genres']),
-        facebook_link=request.form['facebook_link'],
-    )
     try:
-        number = Artist.query.filter(Artist.name == artist.name).count()
-
-        if number == 0:
-            db.session.add(artist)
+        artist_id = create_unique(Artist, dict(
+            name=request.form['name'].strip(),
+            city=request.form['city'],
+            state=request.form['state'],
+            phone=request.form['phone'],
+            # image_link= request.form['image_link'],
+            facebook_link=request.form['facebook_link'],
+        ))
+
+        if artist_id is not None:
+            link_genres(artist_genre, 'artist_id', artist_id, get_genres(request.form.getlist('genres')))
             db.session.commit()
+            artist_names.update(artist_id, request.form['name'])
+            artist_prefixes.update(artist_id, request.form['name'])
+            page_cache.invalidate('artists')
             flash('Artist ' + request.form['name'] +
                   ' was successfully listed!')
         else:
+            db.session.rollback()
             flash(
                 f'This Artsit is already listed {request.form["name"]}, please try again')
     except:
         db.session.rollback()
-        print('DB rollback')
-        print(sys.exc_info())
+        current_app.logger.exception('Could not create artist %r', request.form['name'])
         flash(
             f'There was a problem recording the Artist {request.form["name"]}, please try again')
     finally:
-        print('db closed')
+        current_app.logger.debug('Session closed')
         db.session.close()
 
     return render_template('pages/home.html')
@@ -479,82 +995,378 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@show_views.route('/shows')
+@db.reads_from_replica
+@conditional.versioned(shows_version)
+@page_cache.cached('shows')
 def shows():
+    return render_template('pages/shows.html', **shows_page(db.session))
 
-    show = Show.query.all()
 
-    data = []
-
-    for result in show:
-        venue = Venue.query.get(result.venue_id)
-        artist = Artist.query.get(result.artist_id)
-        print(result.time)
-        data.append({
-            "venue_id": result.venue_id,
-            "venue_name": venue.name,
-            "artist_id": result.artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-            "start_time": (result.time).strftime("%m/%d/%Y, %H:%M")
-        })
-
-    
-    return render_template('pages/shows.html',
-                           shows=data,
-                           time=(result.time).strftime("%m/%d/%Y, %H:%M"))
-
-
-@app.route('/shows/create')
+@show_views.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@show_views.route('/shows/create', methods=['POST'])
 def create_show_submission():
 
     show = Show()
     show.artist_id = request.form['artist_id']
     show.venue_id = request.form['venue_id']
-    show.time = request.form['start_time']
 
     try:
+        show.time = dateutil.parser.parse(request.form['start_time'])
         db.session.add(show)
+        count_new_shows([{'venue_id': show.venue_id, 'artist_id': show.artist_id,
+                          'time': show.time}])
         db.session.commit()
+        page_cache.invalidate('shows', 'venues',
+                              f'venue:{show.venue_id}',
+                              f'artist:{show.artist_id}')
         flash('Show was successfully listed!')
     except:
         db.session.rollback()
-        print('DB rollback')
+        current_app.logger.exception('Could not create show')
         flash('There was a problem recording the show...please try again')
     finally:
-        print('db close')
+        current_app.logger.debug('Session closed')
         db.session.close()
 
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Create Shows in Batch
+#  ----------------------------------------------------------------
+
+SHOW_BATCH_COLUMNS = ('artist_id', 'venue_id', 'start_time')
+
+
+def show_batch_csv(text):
+    """Yield ``(line, record)`` pairs from CSV ``text``, one show per line,
+    with the columns of ``SHOW_BATCH_COLUMNS`` or named by a header line."""
+    reader = csv.reader(io.StringIO(text))
+    columns = SHOW_BATCH_COLUMNS
+    for values in reader:
+        values = [value.strip() for value in values]
+        if reader.line_num == 1 and 'artist_id' in values:
+            columns = values
+        elif any(values):
+            yield reader.line_num, dict(zip(columns, values))
+
+
+def create_show_batch(records):
+    """List the shows of ``(row, record)`` pairs in one transaction, all
+    of them or, when a row has errors, none. Returns the number listed and
+    the ``(row, message)`` errors, where a row of ``None`` is the batch."""
+    config = current_app.config
+    records = list(islice(records, config['SHOW_BATCH_MAX_ROWS'] + 1))
+    if not records:
+        return 0, [(None, 'no shows')]
+    if len(records) > config['SHOW_BATCH_MAX_ROWS']:
+        return 0, [(None, 'more than {} shows'.format(config['SHOW_BATCH_MAX_ROWS']))]
+
+    rows, errors = validate_shows(records)
+    if errors:
+        return 0, errors
+    insert_shows(rows, config['SHOW_BATCH_INSERT_SIZE'])
+    db.session.commit()
+    page_cache.invalidate('shows', 'venues',
+                          *{f'venue:{row["venue_id"]}' for row in rows},
+                          *{f'artist:{row["artist_id"]}' for row in rows})
+    return len(rows), []
+
+
+@show_views.route('/shows/create/batch')
+def create_show_batch_form():
+    return render_template('forms/new_shows.html', form=ShowBatchForm(), errors=[])
+
+
+@show_views.route('/shows/create/batch', methods=['POST'])
+def create_show_batch_submission():
+    form = ShowBatchForm()
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        text = upload.read().decode('utf-8-sig', 'replace')
+    else:
+        text = request.form.get('shows', '')
+
+    try:
+        created, errors = create_show_batch(show_batch_csv(text))
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Could not create a batch of shows')
+        created, errors = 0, [(None, 'There was a problem recording the shows...please try again')]
+    finally:
+        db.session.close()
+
+    if errors:
+        return render_template('forms/new_shows.html', form=form, errors=errors)
+    flash(f'{created} shows were successfully listed!')
+    return render_template('pages/home.html')
+
+
+#  API
+#  ----------------------------------------------------------------
+
+def api_page_size():
+    return page_size(current_app.config['API_PAGE_SIZE'], current_app.config['API_MAX_PAGE_SIZE'])
+
+
+@venue_views.route('/api/v1/venues')
+@db.reads_from_replica
+@conditional.versioned(api_venues_version)
+def api_venues():
+    return stream_json_page(db.session, *api_venues_query(), api_page_size())
+
+
+@artist_views.route('/api/v1/artists')
+@db.reads_from_replica
+@conditional.versioned(artists_version)
+def api_artists():
+    return stream_json_page(db.session, *api_artists_query(), api_page_size())
+
+
+@show_views.route('/api/v1/shows')
+@db.reads_from_replica
+@conditional.versioned(shows_version)
+def api_shows():
+    return stream_json_page(db.session, *api_shows_query(), api_page_size())
+
+
+@show_views.route('/api/v1/shows', methods=['POST'])
+def api_create_shows():
+    """List a JSON array of shows (or an object with it under ``shows``),
+    all or none. Rows count from 1 in the errors."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('shows')
+    if not isinstance(data, list):
+        abort(400)
+
+    try:
+        created, errors = create_show_batch(
+            (row, record if isinstance(record, dict) else {}) for row, record in enumerate(data, 1))
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Could not create a batch of shows')
+        return jsonify({'errors': [{'row': None, 'message': 'There was a problem recording the shows'}]}), 500
+    finally:
+        db.session.close()
+
+    if errors:
+        return jsonify({'errors': [{'row': row, 'message': message} for row, message in errors]}), 422
+    return jsonify({'created': created}), 201
+
+
+@main_views.route('/api/autocomplete')
+@db.reads_from_replica
+def autocomplete():
+    """Venue and artist names starting with ``?q=`` (or with one of their
+    words starting with it), for the search boxes."""
+    config = current_app.config
+    prefix = request.args.get('q', '')
+    limit = page_size(config['AUTOCOMPLETE_LIMIT'], config['AUTOCOMPLETE_MAX_LIMIT'])
+    timeout = config['AUTOCOMPLETE_LOAD_TIMEOUT']
+    return jsonify({
+        kind: [{'id': id, 'name': name}
+               for id, name in index.complete(db.session, prefix, limit, timeout)]
+        for kind, index in (('venues', venue_prefixes), ('artists', artist_prefixes))
+    })
+
+
+@main_views.route('/export/<any(venues, artists, shows):table>.<any(csv, ndjson, "csv.gz", "ndjson.gz"):format>')
+@db.reads_from_replica
+def export(table, format):
+    format, _, compress = format.partition('.')
+    query, columns = export_query(table)
+    filename = '{}.{}{}'.format(table, format, '.gz' if compress else '')
+    response = Response(stream_with_context(export_chunks(query, columns, format, bool(compress))),
+                        mimetype='application/gzip' if compress else EXPORT_FORMATS[format][1])
+    response.headers['Content-Disposition'] = 'attachment; filename=' + filename
+    return response
+
+
+@main_views.route('/cache/stats')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+@main_views.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main_views.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@commands.cli.command('import-data')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False), help='Venues file.')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False), help='Artists file.')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False), help='Shows file.')
+@click.option('--format', type=click.Choice(['csv', 'ndjson']),
+              help='File format, guessed from the extension by default.')
+@click.option('--chunk-size', type=int, help='Rows per batch and transaction.')
+def import_data(venues, artists, shows, format, chunk_size):
+    """Bulk load venues, artists and shows from CSV or NDJSON files."""
+    import importer
+
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    steps = ((venues, importer.import_venues),
+             (artists, importer.import_artists),
+             (shows, importer.import_shows))
+
+    for path, load in steps:
+        if not path:
+            continue
+        result = load(importer.read_records(path, format), chunk_size)
+        click.echo(result)
+        for line, message in sorted(result.errors)[:20]:
+            click.echo('  line {}: {}'.format(line, message), err=True)
+
+    # Core inserts bypass the mapper events that keep these current.
+    venue_names.clear()
+    artist_names.clear()
+    venue_prefixes.clear()
+    artist_prefixes.clear()
+    page_cache.invalidate('venues', 'artists', 'shows')
+
+@commands.cli.command('export-data')
+@click.argument('tables', nargs=-1, type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the files with gzip.')
+@click.option('--output-dir', type=click.Path(file_okay=False), default='.', show_default=True)
+def export_data(tables, format, compress, output_dir):
+    """Dump venues, artists and shows (all by default) to CSV or NDJSON files."""
+    os.makedirs(output_dir, exist_ok=True)
+    for table in tables or ('venues', 'artists', 'shows'):
+        path = os.path.join(output_dir, '{}.{}{}'.format(table, format, '.gz' if compress else ''))
+        query, columns = export_query(table)
+        # Write next to the target and rename, so a reader never sees a
+        # half written dump.
+        with open(path + '.tmp', 'wb') as f:
+            for chunk in export_chunks(query, columns, format, compress):
+                f.write(chunk)
+        os.replace(path + '.tmp', path)
+        db.session.remove()
+        click.echo('Wrote {}'.format(path))
+
+
+@commands.cli.command('rollover-show-counts')
+def rollover_show_counts_command():
+    """Move the shows that started since the last run from the upcoming to
+    the past show counts. Meant to run every few minutes."""
+    updated = rollover_show_counts()
+    page_cache.invalidate('venues')
+    click.echo('Recounted the shows of {} venues and artists'.format(updated))
+
+
+@commands.cli.command('verify-show-counts')
+@click.option('--repair', is_flag=True, help='Recount the rows found wrong.')
+def verify_show_counts(repair):
+    """Check the show counts of venues and artists against their shows."""
+    # Counts are only exact right after a rollover.
+    rollover_show_counts()
+    now = db.session.get(ShowCountRollover, 1).rolled_over_at
+    wrong = 0
+    for model, column in SHOW_OWNERS:
+        rows = db.session.execute(show_count_mismatches(model, column, now)).all()
+        wrong += len(rows)
+        click.echo('{}: {} with wrong show counts'.format(model.__tablename__, len(rows)))
+        for row in rows[:20]:
+            click.echo('  {} {}: upcoming {} (stored {}), past {} (stored {})'.format(
+                model.__tablename__, row.id, row.upcoming, row.upcoming_shows_count,
+                row.past, row.past_shows_count), err=True)
+        if repair and rows:
+            recount_shows(model, column, [row.id for row in rows], now)
+    if repair:
+        db.session.commit()
+        page_cache.invalidate('venues')
+    elif wrong:
+        raise SystemExit(1)
+
+
+@commands.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove the files of earlier builds.')
+def build_assets(clean):
+    """Write fingerprinted, precompressed static files and bundles."""
+    manifest = assets.build(clean)
+    click.echo('Built {} assets into {}'.format(len(manifest), assets.output))
+
+
+@commands.cli.command('compile-templates')
+def compile_templates():
+    """Write the bytecode of every template to TEMPLATE_CACHE_DIR."""
+    try:
+        names = templates.compile()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo('Compiled {} templates into {}'.format(len(names), templates.directory))
+
+#----------------------------------------------------------------------------#
+# App Factory.
+#----------------------------------------------------------------------------#
+
+def create_app(config=None):
+    """Build the app from config.py, which reads the environment, and the
+    ``config`` mapping on top of it (for scripts and tests).
+
+    Nothing connects to the database here, but to build the autocomplete
+    indexes with ``AUTOCOMPLETE_PRELOAD``: the engines are made on first
+    use, and forked workers drop the connections they inherit.
+    """
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if config:
+        app.config.from_mapping(config)
+
+    # First, so that the other extensions log through it.
+    logs.init_app(app)
+
+    if not app.config['SECRET_KEY']:
+        # A key known to anyone would let them forge sessions: only tests
+        # get one. Elsewhere each process makes up its own, which does not
+        # verify the sessions and CSRF tokens signed by the other workers.
+        app.config['SECRET_KEY'] = 'dev' if app.testing else os.urandom(32)
+        if not (app.debug or app.testing):
+            app.logger.warning('SECRET_KEY is not set: sessions will not verify '
+                               'across workers or restarts.')
+    moment.init_app(app)
+    db.init_app(app)
+    # Imported here, as Flask-Migrate imports alembic, a good share of the
+    # startup time of a worker that turns MIGRATIONS off.
+    if app.config['MIGRATIONS']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    page_cache.init_app(app)
+    assets.init_app(app)
+    templates.init_app(app)
+    conditional.init_app(app)
+    sql_stats.init_app(app)
+    dates.init_app(app)
+
+    for blueprint in (main_views, venue_views, artist_views, show_views, commands):
+        app.register_blueprint(blueprint)
+
+    # Once the filters are registered, which templates compile against.
+    if app.config['TEMPLATE_PRELOAD']:
+        templates.preload()
+
+    if app.config['AUTOCOMPLETE_PRELOAD']:
+        with app.app_context():
+            for index in (venue_prefixes, artist_prefixes):
+                index.load(db.session, app.config['AUTOCOMPLETE_LOAD_TIMEOUT'])
+            db.session.remove()
+
+    return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -562,11 +1374,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
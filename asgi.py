@@ -0,0 +1,268 @@
+"""ASGI entry point with async database access for the read-only routes.
+
+    uvicorn asgi:application
+
+The venue, artist and show listings, the searches, the detail pages and
+the JSON API are served here on async SQLAlchemy sessions, so a request
+waiting on the database yields the event loop instead of holding a
+thread. They run the same page functions as the Flask views (through
+``AsyncSession.run_sync``) and render the same templates. Every other
+route, the writes included, goes to the Flask app through asgiref's WSGI
+adapter, which runs it in a thread pool as before.
+
+Needs asgiref and an async driver, asyncpg for Postgres or aiosqlite for
+SQLite. The async engines use the primary and replica URLs with the
+driver swapped, unless ``ASYNC_DATABASE_URL`` (and
+``ASYNC_DATABASE_REPLICA_URL``) are set.
+"""
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map
+
+import app as fyyur
+from routing import driver_options, pinned_to_primary
+from streaming import JSONPageWriter
+
+
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# endpoint: (template, page function, cache tags, version function)
+PAGES = {
+    'venues.venues': ('pages/venues.html', fyyur.venues_page, ('venues',), fyyur.venues_version),
+    'venues.search_venues': ('pages/search_venues.html', fyyur.search_venues_page, (), None),
+    'venues.show_venue': ('pages/show_venue.html', fyyur.venue_page, ('venue:{venue_id}',),
+                          fyyur.venue_version),
+    'artists.artists': ('pages/artists.html', fyyur.artists_page, ('artists',),
+                        fyyur.artists_version),
+    'artists.search_artists': ('pages/search_artists.html', fyyur.search_artists_page, (), None),
+    'artists.show_artist': ('pages/show_artist.html', fyyur.artist_page, ('artist:{artist_id}',),
+                            fyyur.artist_version),
+    'shows.shows': ('pages/shows.html', fyyur.shows_page, ('shows',), fyyur.shows_version),
+}
+
+# endpoint: (function returning (statement, columns, serialize), version function)
+API = {
+    'venues.api_venues': (fyyur.api_venues_query, fyyur.api_venues_version),
+    'artists.api_artists': (fyyur.api_artists_query, fyyur.artists_version),
+    'shows.api_shows': (fyyur.api_shows_query, fyyur.shows_version),
+}
+
+
+def async_database_url(url):
+    url = make_url(url)
+    backend = url.drivername.split('+')[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError('No async driver known for {!r}'.format(url.drivername))
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def build_environ(scope, body):
+    """WSGI environ of the ASGI http ``scope``, enough for a request context."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            return body
+
+
+def response_start(response):
+    return {
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.to_wsgi_list()],
+    }
+
+
+class AsyncReads(object):
+    """ASGI application serving the read-only routes of ``flask_app`` with
+    async database access and the rest through its WSGI interface."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.url_map = Map([rule.empty() for rule in flask_app.url_map.iter_rules()
+                            if rule.endpoint in PAGES or rule.endpoint in API])
+        self._sessions = None
+
+    def sessions(self):
+        """``(primary, replica)`` async session factories, made on first use."""
+        if self._sessions is None:
+            config = self.flask_app.config
+            primary = config.get('ASYNC_DATABASE_URL') or \
+                async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+            replica = config.get('ASYNC_DATABASE_REPLICA_URL') or (
+                async_database_url(config['SQLALCHEMY_BINDS']['replica'])
+                if 'replica' in (config['SQLALCHEMY_BINDS'] or {}) else None)
+            self._sessions = tuple(
+                sessionmaker(self._engine(url), class_=AsyncSession, expire_on_commit=False)
+                if url else None for url in (primary, replica))
+        return self._sessions
+
+    def _engine(self, url):
+        url = make_url(url)
+        config = self.flask_app.config
+        return create_async_engine(url, **driver_options(
+            url, config['SQLALCHEMY_ENGINE_OPTIONS'], config['SQLALCHEMY_STATEMENT_TIMEOUT']))
+
+    def session(self):
+        primary, replica = self.sessions()
+        # Same read-your-writes rule as RoutingSQLAlchemy.
+        if replica is None or pinned_to_primary():
+            return primary()
+        return replica()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return await self.wsgi(scope, receive, send)
+
+        adapter = self.url_map.bind('localhost')
+        try:
+            endpoint, args = adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return await self.wsgi(scope, receive, send)
+
+        environ = build_environ(scope, await read_body(receive))
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    if endpoint in API:
+                        return await self.stream_api(endpoint, send)
+                    response = await self.page(endpoint, args)
+            except HTTPException as error:
+                response = app.handle_user_exception(error)
+            response = app.process_response(app.make_response(response))
+
+        await send(response_start(response))
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def validators(self, session, version, args):
+        """ETag and Last-Modified of the page, as ConditionalGet.versioned
+        computes them, or ``None``."""
+        if version is None or not fyyur.conditional.applies():
+            return None
+        current = await session.run_sync(version, **args)
+        return None if current is None else fyyur.conditional.validators(current)
+
+    async def page(self, endpoint, args):
+        template, build, tags, version = PAGES[endpoint]
+        cache = fyyur.page_cache
+        conditional = fyyur.conditional
+
+        async with self.session() as session:
+            validators = await self.validators(session, version, args)
+            if validators is not None:
+                response = conditional.not_modified(*validators)
+                if response is not None:
+                    return response
+
+            key = response = None
+            if tags and cache.cacheable():
+                key, response = cache.lookup([tag.format(**args) for tag in tags],
+                                             validators[0] if validators else None)
+
+            if response is None:
+                context = await session.run_sync(build, **args)
+                response = self.flask_app.make_response(render_template(template, **context))
+                if key is not None:
+                    cache.store(key, response)
+
+        if validators is not None and response.status_code == 200:
+            conditional.add_validators(response, *validators)
+        return response
+
+    async def stream_api(self, endpoint, send):
+        """Stream one JSON API page from a server-side cursor, or send a
+        ``304`` if the client has it."""
+        app = self.flask_app
+        query, version = API[endpoint]
+        statement, columns, serialize = query()
+        limit = fyyur.api_page_size()
+        writer = JSONPageWriter(columns, serialize, limit)
+
+        async with self.session() as session:
+            validators = await self.validators(session, version, {})
+            if validators is not None:
+                response = fyyur.conditional.not_modified(*validators)
+                if response is not None:
+                    response = app.process_response(response)
+                    await send(response_start(response))
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return
+
+            result = await session.stream(statement.limit(limit + 1))
+            response = app.response_class(mimetype='application/json')
+            if validators is not None:
+                fyyur.conditional.add_validators(response, *validators)
+            response = app.process_response(response)
+            await send(response_start(response))
+            await send({'type': 'http.response.body',
+                        'body': writer.start().encode('utf-8'), 'more_body': True})
+            async for rows in result.partitions(app.config['API_YIELD_PER']):
+                chunk = ''.join(writer.row(row) for row in rows)
+                await send({'type': 'http.response.body',
+                            'body': chunk.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': writer.end().encode('utf-8')})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for factory in self._sessions or ():
+                    if factory is not None:
+                        await factory.kw['bind'].dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = AsyncReads(fyyur.create_app())
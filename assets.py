@@ -0,0 +1,248 @@
+"""Fingerprinted static assets.
+
+``flask build-assets`` writes every file of the static folder, and the
+stylesheet and script bundles of ``BUNDLES``, to ``static/dist`` under a
+name carrying a hash of its content, with gzip (and, when the brotli
+package is installed, brotli) variants of the text files and a
+``manifest.json`` mapping the original names to the new ones. A new build
+leaves the previous files in place, for pages still referencing them,
+unless ``--clean`` is given.
+
+Templates link assets through ``asset_url(name)`` and
+``asset_urls(bundle)``. Without a manifest they return the plain static
+URLs (of each file of a bundle), so nothing needs building in development.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+#: Bundles, in the order their files are concatenated.
+BUNDLES = {
+    'main.css': ('css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'),
+    'head.js': ('js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'),
+    'main.js': ('js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'),
+}
+
+#: Extensions worth storing compressed (woff and images already are).
+COMPRESSIBLE = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.eot', '.ttf', '.otf'}
+
+MANIFEST = 'manifest.json'
+
+# Strings and /*! notices, kept as they are, or other comments.
+CSS_VERBATIM = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*!.*?\*/)|/\*.*?\*/''', re.S)
+CSS_SPACE = re.compile(r'\s*([{};,>])\s*')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minify_css(text):
+    """Drop comments (but ``/*! ... */`` notices) and needless whitespace,
+    leaving strings alone."""
+    def code(part):
+        return CSS_SPACE.sub(r'\1', re.sub(r'\s+', ' ', part)).replace(';}', '}')
+
+    parts = []
+    position = 0
+    for match in CSS_VERBATIM.finditer(text):
+        parts.append(code(text[position:match.start()]))
+        parts.append(match.group(1) or '')
+        position = match.end()
+    parts.append(code(text[position:]))
+    return ''.join(parts).strip()
+
+
+def minify_js(name, text):
+    if name.endswith('.min.js') or rjsmin is None:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def fingerprint(name, data):
+    root, extension = posixpath.splitext(name)
+    return '{}.{}{}'.format(root, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+def source_files(static_folder, output):
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(name for name in dirs
+                         if not name.startswith('.') and os.path.join(root, name) != output)
+        for name in sorted(files):
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/')
+
+
+class Build(object):
+    """One run of the build, writing into ``output`` (a folder inside
+    ``static_folder``) and filling ``manifest``."""
+
+    def __init__(self, static_folder, output, static_url_path):
+        self.static_folder = static_folder
+        self.output = output
+        self.prefix = posixpath.relpath(output, static_folder).replace(os.sep, '/')
+        self.static_url_path = static_url_path
+        self.manifest = {}
+        self.written = set()
+
+    def run(self):
+        names = list(source_files(self.static_folder, self.output))
+        # Stylesheets last, their url()s point at the fingerprinted files.
+        for name in sorted(names, key=lambda name: name.endswith('.css')):
+            with open(os.path.join(self.static_folder, name), 'rb') as f:
+                data = f.read()
+            if name.endswith('.css'):
+                data = self.rewrite_urls(name, data.decode('utf-8')).encode('utf-8')
+            self.write(name, data)
+
+        for bundle, sources in sorted(BUNDLES.items()):
+            parts = []
+            for name in sources:
+                with open(os.path.join(self.static_folder, name), encoding='utf-8') as f:
+                    text = f.read()
+                if bundle.endswith('.css'):
+                    parts.append(minify_css(self.rewrite_urls(name, text)))
+                else:
+                    parts.append(minify_js(name, text).strip())
+            # A script not ending its last statement must not run into the next.
+            self.write(bundle, ('\n' if bundle.endswith('.css') else '\n;\n').join(parts).encode('utf-8'))
+        return self.manifest
+
+    def rewrite_urls(self, name, text):
+        """Point the relative ``url()``s of stylesheet ``name`` at the
+        fingerprinted files, by absolute path, so they resolve wherever the
+        stylesheet ends up."""
+        def replace(match):
+            url = match.group(2).strip()
+            if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+                return match.group(0)
+            path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+            target = self.manifest.get(target, target)
+            return 'url("{}/{}{}")'.format(self.static_url_path, target, suffix)
+        return CSS_URL.sub(replace, text)
+
+    def write(self, name, data):
+        target = posixpath.join(self.prefix, fingerprint(name, data))
+        path = os.path.join(self.static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        variants = [(path, data)]
+        if posixpath.splitext(name)[1] in COMPRESSIBLE:
+            variants.append((path + '.gz', gzip.compress(data, 9, mtime=0)))
+            if brotli is not None:
+                variants.append((path + '.br', brotli.compress(data)))
+        for variant, content in variants:
+            if variant != path and len(content) >= len(data):
+                continue
+            # Same name, same content: a file from an earlier build is kept.
+            if not os.path.exists(variant):
+                write_atomic(variant, content)
+            self.written.add(variant)
+        self.manifest[name] = target
+
+
+def write_atomic(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+class Assets(object):
+    """Fingerprinted asset URLs for the templates, and the route serving
+    the built files precompressed with far-future immutable caching.
+
+    Configured with ``ASSETS_FOLDER`` (inside the static folder) and
+    ``ASSETS_MAX_AGE`` (seconds).
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.version = ''
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_FOLDER', 'dist')
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+
+        self.app = app
+        self.folder = app.config['ASSETS_FOLDER']
+        self.max_age = app.config['ASSETS_MAX_AGE']
+        self.load()
+
+        app.add_url_rule('{}/{}/<path:filename>'.format(app.static_url_path, self.folder),
+                         endpoint='assets', view_func=self.send)
+        app.jinja_env.globals.update(asset_url=self.url, asset_urls=self.urls)
+        app.extensions['assets'] = self
+
+    @property
+    def output(self):
+        return os.path.join(self.app.static_folder, self.folder)
+
+    def load(self):
+        try:
+            with open(os.path.join(self.output, MANIFEST), 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.manifest, self.version = {}, ''
+            return
+        self.manifest = json.loads(data.decode('utf-8'))
+        self.version = hashlib.sha256(data).hexdigest()[:12]
+
+    def build(self, clean=False):
+        """Build the assets and return the manifest."""
+        build = Build(self.app.static_folder, self.output, self.app.static_url_path)
+        manifest = build.run()
+        os.makedirs(self.output, exist_ok=True)
+        write_atomic(os.path.join(self.output, MANIFEST),
+                     json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+        if clean:
+            for root, _, files in os.walk(self.output):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name != MANIFEST and path not in build.written:
+                        os.remove(path)
+        self.load()
+        return manifest
+
+    def url(self, name):
+        """URL of static file ``name``, fingerprinted once built."""
+        return url_for('static', filename=self.manifest.get(name, name))
+
+    def urls(self, bundle):
+        """URLs to link for ``bundle``: the bundle once built, else its files."""
+        if bundle in self.manifest:
+            return [url_for('static', filename=self.manifest[bundle])]
+        return [url_for('static', filename=name) for name in BUNDLES[bundle]]
+
+    def send(self, filename):
+        """A built file, as brotli or gzip when the client takes them."""
+        path = os.path.join(self.output, *filename.split('/'))
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+                response = send_from_directory(
+                    self.output, filename + suffix, max_age=self.max_age,
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.output, filename, max_age=self.max_age)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,84 @@
+"""EXPLAIN checks for the hot queries of the listing and detail routes.
+
+Each query is paired with the indexes it is expected to use; the check
+fails when the plan mentions none of them. On Postgres sequential scans
+are switched off for the check, so a small table does not hide an index
+the planner could not use at all.
+"""
+import datetime
+
+from app import db, Artist, Show, Venue, venue_genre
+
+
+def plan(query):
+    """The query plan of ``query`` as text."""
+    connection = db.session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+        return '\n'.join(str(row[-1]) for row in rows)
+    rows = connection.exec_driver_sql('EXPLAIN ' + str(compiled), params)
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+def hot_queries():
+    """(name, query, expected index names) for the queries behind the routes."""
+    now = datetime.datetime.utcnow()
+    return [
+        ('venues listing',
+         db.session.query(Venue.id).order_by(Venue.state, Venue.city, Venue.name, Venue.id).limit(50),
+         ('ix_venue_state_city_name_id',)),
+        ('venues by city',
+         db.session.query(Venue.id).filter(Venue.state == 'CA', Venue.city == 'San Francisco'),
+         ('ix_venue_state_city_name_id',)),
+        # Outside Postgres the trigram index is a plain index on name (with
+        # the id as rowid on SQLite), which serves the same order.
+        ('artists listing',
+         db.session.query(Artist.id).order_by(Artist.name, Artist.id).limit(50),
+         ('ix_artist_name_id', 'ix_artist_name_trgm')),
+        ('shows listing',
+         db.session.query(Show.id).order_by(Show.time, Show.id).limit(50),
+         ('ix_show_time_id',)),
+        ('shows of a venue',
+         db.session.query(Show.id).filter(Show.venue_id == 1).order_by(Show.time),
+         ('ix_show_venue_id_time',)),
+        ('shows of an artist',
+         db.session.query(Show.id).filter(Show.artist_id == 1).order_by(Show.time),
+         ('ix_show_artist_id_time',)),
+        # Recounting the shows of a venue, as creating shows and the
+        # rollover do.
+        ('upcoming shows of a venue',
+         db.session.query(db.func.count(Show.id)).filter(Show.venue_id == 1, Show.time > now),
+         ('ix_show_venue_id_time',)),
+        ('venues of a genre',
+         db.session.query(venue_genre.c.venue_id).filter(venue_genre.c.genre_id == 1),
+         ('ix_venue_genre_genre_id_venue_id',)),
+        # The ETag of every listing reads these.
+        ('newest venue', db.session.query(db.func.max(Venue.updated_at)), ('ix_venue_updated_at',)),
+        ('newest artist', db.session.query(db.func.max(Artist.updated_at)), ('ix_artist_updated_at',)),
+        ('newest show', db.session.query(db.func.max(Show.updated_at)), ('ix_show_updated_at',)),
+        ('shows started since the last rollover',
+         db.session.query(Show.venue_id).filter(
+             Show.time > now - datetime.timedelta(minutes=10), Show.time <= now),
+         ('ix_show_time_id',)),
+    ]
+
+
+def check_plans():
+    """Return one message per hot query whose plan uses none of its indexes."""
+    failures = []
+    postgres = db.session.connection().dialect.name == 'postgresql'
+    if postgres:
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+    try:
+        for name, query, indexes in hot_queries():
+            text = plan(query)
+            if not any(index in text for index in indexes):
+                failures.append('{}: expected {}, plan was: {}'.format(
+                    name, ' or '.join(indexes), ' | '.join(text.splitlines())))
+    finally:
+        db.session.rollback()
+    return failures
@@ -0,0 +1,344 @@
+"""Route benchmarks for Fyyur.
+
+Seeds a database at the requested scale (reused between runs unless
+``--reseed`` is given), drives every route through the Flask test client
+and reports p50/p95/p99 latency, the SQL query count (read from the
+request's stats once the body is closed, so the queries of a streamed
+body count too) and the peak Python memory of one request.
+
+Compared with a baseline file, the run fails when a route is slower than
+the baseline by more than ``--tolerance`` or runs more queries. It also
+fails when the EXPLAIN plan of a hot query does not use its index (see
+``benchmarks/explain.py``).
+
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale small --save-baseline
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# The page cache would turn every repeated GET into a hit, measure the
+# handlers themselves unless asked otherwise.
+os.environ.setdefault('CACHE_TYPE', 'null')
+
+from flask import current_app
+
+from app import create_app, db, Artist, Show, Venue
+from instrumentation import ENVIRON_KEY
+from pagination import encode_cursor
+from benchmarks.explain import check_plans
+from benchmarks.seed import SCALES, seed
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Timing differences below this are noise, whatever the relative change.
+NOISE_MS = 1.0
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    rank = max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)
+    return values[rank]
+
+
+def deep_cursor(query, columns):
+    """Cursor pointing 90% of the way into ``query`` ordered by ``columns``."""
+    total = query.count()
+    row = query.order_by(*columns).offset(max(int(total * 0.9) - 1, 0)).first()
+    return encode_cursor([getattr(row, column.key) for column in columns]) if row else ''
+
+
+def busiest(column):
+    return db.session.query(column).group_by(column).order_by(
+        db.func.count(Show.id).desc()).limit(1).scalar()
+
+
+def etag(url):
+    return current_app.test_client().get(url).headers['ETag']
+
+
+def routes():
+    """(name, method, prepare) for every route. ``prepare(i)`` returns the
+    URL, form data and, optionally, request headers of the i-th call."""
+    venue_id = busiest(Show.venue_id) or 1
+    artist_id = busiest(Show.artist_id) or 1
+    venues_after = deep_cursor(db.session.query(Venue.state, Venue.city, Venue.name, Venue.id),
+                               (Venue.state, Venue.city, Venue.name, Venue.id))
+    artists_after = deep_cursor(db.session.query(Artist.name, Artist.id),
+                                (Artist.name, Artist.id))
+    shows_after = deep_cursor(db.session.query(Show.time, Show.id), (Show.time, Show.id))
+    db.session.remove()
+    venue_url = '/venues/{}'.format(venue_id)
+    artist_url = '/artists/{}'.format(artist_id)
+    not_modified = {url: {'If-None-Match': etag(url)}
+                    for url in ('/venues', venue_url, artist_url, '/api/v1/shows')}
+
+    venue_form = lambda i: {
+        'name': 'Benchmark Venue {}'.format(i), 'city': 'San Francisco', 'state': 'CA',
+        'address': '1 Main Street', 'phone': '555-000-0000', 'genres': ['Jazz', 'Blues'],
+        'facebook_link': 'https://www.facebook.com/benchmark'}
+    artist_form = lambda i: {
+        'name': 'Benchmark Artist {}'.format(i), 'city': 'San Francisco', 'state': 'CA',
+        'phone': '555-000-0000', 'genres': ['Jazz'],
+        'facebook_link': 'https://www.facebook.com/benchmark'}
+
+    def delete_venue(i):
+        id = db.session.query(Venue.id).filter(
+            Venue.name.like('Benchmark Venue %')).order_by(Venue.id.desc()).limit(1).scalar()
+        db.session.remove()
+        return '/venues/{}'.format(id), None
+
+    return [
+        ('index', 'GET', lambda i: ('/', None)),
+        ('venues', 'GET', lambda i: ('/venues', None)),
+        ('venues_deep_page', 'GET', lambda i: ('/venues?after=' + venues_after, None)),
+        ('venues_genre', 'GET', lambda i: ('/venues?genre=Jazz', None)),
+        ('artists', 'GET', lambda i: ('/artists', None)),
+        ('artists_deep_page', 'GET', lambda i: ('/artists?after=' + artists_after, None)),
+        ('artists_genre', 'GET', lambda i: ('/artists?genre=Jazz', None)),
+        ('shows', 'GET', lambda i: ('/shows', None)),
+        ('shows_deep_page', 'GET', lambda i: ('/shows?after=' + shows_after, None)),
+        ('show_venue', 'GET', lambda i: ('/venues/{}'.format(venue_id), None)),
+        ('show_artist', 'GET', lambda i: ('/artists/{}'.format(artist_id), None)),
+        ('venues_not_modified', 'GET', lambda i: ('/venues', None, not_modified['/venues'])),
+        ('show_venue_not_modified', 'GET', lambda i: (venue_url, None, not_modified[venue_url])),
+        ('show_artist_not_modified', 'GET', lambda i: (artist_url, None, not_modified[artist_url])),
+        ('search_venues', 'POST', lambda i: ('/venues/search', {'search_term': 'blue'})),
+        ('search_artists', 'POST', lambda i: ('/artists/search', {'search_term': 'red'})),
+        ('autocomplete', 'GET', lambda i: ('/api/autocomplete?q=bl', None)),
+        ('create_venue_form', 'GET', lambda i: ('/venues/create', None)),
+        ('create_artist_form', 'GET', lambda i: ('/artists/create', None)),
+        ('create_shows', 'GET', lambda i: ('/shows/create', None)),
+        ('create_show_batch_form', 'GET', lambda i: ('/shows/create/batch', None)),
+        ('edit_venue', 'GET', lambda i: ('/venues/{}/edit'.format(venue_id), None)),
+        ('edit_artist', 'GET', lambda i: ('/artists/{}/edit'.format(artist_id), None)),
+        ('cache_stats', 'GET', lambda i: ('/cache/stats', None)),
+        ('api_venues', 'GET', lambda i: ('/api/v1/venues', None)),
+        ('api_artists', 'GET', lambda i: ('/api/v1/artists', None)),
+        ('api_shows', 'GET', lambda i: ('/api/v1/shows', None)),
+        ('api_shows_deep_page', 'GET', lambda i: ('/api/v1/shows?after=' + shows_after, None)),
+        ('api_shows_not_modified', 'GET', lambda i: (
+            '/api/v1/shows', None, not_modified['/api/v1/shows'])),
+        ('export_shows', 'GET', lambda i: ('/export/shows.csv', None)),
+        ('export_shows_gzip', 'GET', lambda i: ('/export/shows.ndjson.gz', None)),
+        # Writes run last so the reads above see the seeded data only.
+        ('create_venue_submission', 'POST', lambda i: ('/venues/create', venue_form(i))),
+        ('create_artist_submission', 'POST', lambda i: ('/artists/create', artist_form(i))),
+        ('create_show_submission', 'POST', lambda i: ('/shows/create', {
+            'venue_id': venue_id, 'artist_id': artist_id,
+            'start_time': '2030-01-01 20:00:00'})),
+        ('create_show_batch', 'POST', lambda i: ('/shows/create/batch', {
+            'shows': ''.join('{},{},2031-01-{:02d} {:02d}:{:02d}:00\n'.format(
+                artist_id, venue_id, 1 + n % 28, i % 24, n % 60) for n in range(100))})),
+        ('api_create_shows', 'POST', lambda i: ('/api/v1/shows', json.dumps([
+            {'artist_id': artist_id, 'venue_id': venue_id,
+             'start_time': '2032-01-{:02d}T{:02d}:{:02d}:00'.format(1 + n % 28, i % 24, n % 60)}
+            for n in range(100)]), {'Content-Type': 'application/json'})),
+        ('edit_venue_submission', 'POST', lambda i: (
+            '/venues/{}/edit'.format(venue_id), dict(venue_form(i), name='Benchmark Edited Venue'))),
+        ('edit_artist_submission', 'POST', lambda i: (
+            '/artists/{}/edit'.format(artist_id), dict(artist_form(i), name='Benchmark Edited Artist'))),
+        ('delete_venue', 'DELETE', delete_venue),
+    ]
+
+
+def seeded_schema_current():
+    """Whether the database has every table and column of the models. One
+    seeded before a column was added is seeded again."""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            return False
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        if not set(table.columns.keys()) <= existing:
+            return False
+    return True
+
+
+def consume(response):
+    """Read the whole body chunk by chunk, so a streamed response is
+    measured without being buffered."""
+    for _ in response.response:
+        pass
+    response.close()
+
+
+def measure(client, method, prepare, iterations, warmup):
+    def call(i, stats=None, **kwargs):
+        url, data, *headers = prepare(i)
+        return client.open(url, method=method, data=data,
+                           headers=headers[0] if headers else None,
+                           environ_overrides={ENVIRON_KEY: stats}, **kwargs)
+
+    for i in range(warmup):
+        call(i)
+
+    timings = []
+    queries = []
+    for i in range(warmup, warmup + iterations):
+        stats = []
+        start = time.perf_counter()
+        response = call(i, stats, buffered=False)
+        consume(response)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError('{} {} returned {}'.format(method, prepare(i)[0], response.status_code))
+        if not stats:
+            raise RuntimeError('{} {} ran without SQL instrumentation'.format(method, prepare(i)[0]))
+        queries.append(stats[0].count)
+
+    tracemalloc.start()
+    consume(call(warmup + iterations, buffered=False))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': max(queries),
+        'peak_kib': round(peak / 1024.0, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against ``baseline``."""
+    failures = []
+    for name, expected in sorted(baseline.items()):
+        result = results.get(name)
+        if result is None:
+            continue
+        if result['queries'] > expected['queries']:
+            failures.append('{}: {} queries, baseline {}'.format(
+                name, result['queries'], expected['queries']))
+        if result['p95_ms'] > max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + NOISE_MS):
+            failures.append('{}: p95 {:.2f} ms, baseline {:.2f} ms'.format(
+                name, result['p95_ms'], expected['p95_ms']))
+        if result['peak_kib'] > expected['peak_kib'] * (1 + tolerance):
+            failures.append('{}: peak {:.1f} KiB, baseline {:.1f} KiB'.format(
+                name, result['peak_kib'], expected['peak_kib']))
+    return failures
+
+
+def report(results):
+    print('{:<26} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+        'route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KiB'))
+    for name, result in results.items():
+        print('{:<26} {p50_ms:>9.2f} {p95_ms:>9.2f} {p99_ms:>9.2f} {queries:>8} {peak_kib:>10.1f}'.format(
+            name, **result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--database-uri',
+                        help='defaults to a SQLite file per scale in the temp directory')
+    parser.add_argument('--reseed', action='store_true', help='regenerate the data')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', action='append', help='route name to run, repeatable')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative slowdown before failing (0.5 = 50%%)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    for key in ('venues', 'artists', 'shows'):
+        if getattr(args, key):
+            scale[key] = getattr(args, key)
+
+    if args.database_uri:
+        database_uri = args.database_uri
+        seeded = None
+    else:
+        # The seeded file is kept and every run works on a copy of it, so
+        # the write routes do not change what the next run reads.
+        seeded = os.path.join(tempfile.gettempdir(),
+                              'fyyur-bench-{venues}-{artists}-{shows}.db'.format(**scale))
+        database_uri = 'sqlite:///' + seeded
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri,
+                      'SECRET_KEY': 'benchmark',
+                      'WTF_CSRF_ENABLED': False,
+                      'SQL_QUERY_BUDGET': None})
+    app.debug = False
+
+    with app.app_context():
+        if args.reseed or not seeded_schema_current():
+            print('Seeding {venues} venues, {artists} artists, {shows} shows...'.format(**scale))
+            start = time.perf_counter()
+            seed(**scale)
+            print('Seeded in {:.1f} s'.format(time.perf_counter() - start))
+        else:
+            # A database seeded before an index was added still gets it.
+            # Expression indexes are left out: SQLite does not report them,
+            # so checkfirst would try to create them again.
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    if all(isinstance(expression, db.Column) for expression in index.expressions):
+                        index.create(db.engine, checkfirst=True)
+        db.session.remove()
+        db.engine.dispose()
+
+    if seeded:
+        working = seeded[:-len('.db')] + '-run.db'
+        shutil.copyfile(seeded, working)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + working
+
+    with app.app_context():
+        plan_failures = check_plans()
+
+        client = app.test_client()
+        results = {}
+        for name, method, prepare in routes():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(client, method, prepare, args.iterations, args.warmup)
+
+    report(results)
+
+    if plan_failures:
+        print('\nQueries not using their indexes:')
+        for failure in plan_failures:
+            print('  ' + failure)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'scale': scale, 'routes': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to {}'.format(args.baseline))
+        return 1 if plan_failures else 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['scale'] != scale:
+            print('\nBaseline was recorded at {}, not comparing.'.format(baseline['scale']))
+            return 1 if plan_failures else 0
+        failures = compare(results, baseline['routes'], args.tolerance)
+        if failures:
+            print('\nRegressions against {}:'.format(args.baseline))
+            for failure in failures:
+                print('  ' + failure)
+            return 1
+    return 1 if plan_failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Synthetic data generator for the benchmark suite.
+
+Fills the database with venues, artists, shows and genres at a chosen
+scale using batched multi-row inserts, so a million shows take minutes
+rather than hours. The data is deterministic for a given ``seed``.
+"""
+import datetime
+import random
+
+from app import (db, recount_shows, Artist, Genre, Show, ShowCountRollover, Venue,
+                 artist_genre, venue_genre, SHOW_OWNERS)
+from forms import VenueForm
+
+
+SCALES = {
+    'tiny': dict(venues=20, artists=100, shows=1000),
+    'small': dict(venues=100, artists=1000, shows=10000),
+    'medium': dict(venues=1000, artists=10000, shows=100000),
+    'large': dict(venues=10000, artists=100000, shows=1000000),
+}
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'),
+    ('Seattle', 'WA'), ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'),
+    ('Memphis', 'TN'), ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Miami', 'FL'),
+    ('Boston', 'MA'), ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Phoenix', 'AZ'),
+]
+
+ADJECTIVES = [
+    'Blue', 'Red', 'Golden', 'Silver', 'Electric', 'Velvet', 'Wild', 'Quiet',
+    'Midnight', 'Crimson', 'Neon', 'Rusty', 'Lucky', 'Broken', 'Royal', 'Little',
+]
+
+NOUNS = [
+    'Hop', 'Lounge', 'Hall', 'Room', 'Garden', 'Cellar', 'Club', 'Stage',
+    'Petals', 'Wolves', 'Echoes', 'Strings', 'Drums', 'Riders', 'Saints', 'Owls',
+]
+
+GENRES = [name for name, _ in VenueForm.genres.kwargs['choices']]
+
+
+def _name(rng, i):
+    return '{} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS), i)
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert(table, rows, chunk_size):
+    for chunk in _chunks(rows, chunk_size):
+        db.session.execute(table.insert(), chunk)
+
+
+def seed(venues, artists, shows, seed=0, chunk_size=10000):
+    """Recreate the schema and fill it with generated rows."""
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+
+    db.drop_all()
+    db.create_all()
+
+    _insert(Genre.__table__,
+            [{'id': i, 'name': name} for i, name in enumerate(GENRES, 1)], chunk_size)
+
+    venue_rows = []
+    for i in range(1, venues + 1):
+        city, state = rng.choice(CITIES)
+        venue_rows.append({
+            'id': i,
+            'name': _name(rng, i),
+            'city': city,
+            'state': state,
+            'address': '{} Main Street'.format(rng.randint(1, 9999)),
+            'phone': '555-{:03d}-{:04d}'.format(rng.randint(0, 999), rng.randint(0, 9999)),
+            'seeking_talent': rng.random() < 0.5,
+        })
+    _insert(Venue.__table__, venue_rows, chunk_size)
+
+    artist_rows = []
+    for i in range(1, artists + 1):
+        city, state = rng.choice(CITIES)
+        artist_rows.append({
+            'id': i,
+            'name': _name(rng, i),
+            'city': city,
+            'state': state,
+            'phone': '555-{:03d}-{:04d}'.format(rng.randint(0, 999), rng.randint(0, 9999)),
+            'seeking_venue': rng.random() < 0.5,
+        })
+    _insert(Artist.__table__, artist_rows, chunk_size)
+
+    genre_ids = range(1, len(GENRES) + 1)
+    _insert(venue_genre,
+            [{'venue_id': i, 'genre_id': genre_id}
+             for i in range(1, venues + 1)
+             for genre_id in rng.sample(genre_ids, rng.randint(1, 3))], chunk_size)
+    _insert(artist_genre,
+            [{'artist_id': i, 'genre_id': genre_id}
+             for i in range(1, artists + 1)
+             for genre_id in rng.sample(genre_ids, rng.randint(1, 3))], chunk_size)
+
+    # Shows are generated chunk by chunk to keep memory flat at large scales.
+    for start in range(0, shows, chunk_size):
+        db.session.execute(Show.__table__.insert(), [{
+            'id': i,
+            'venue_id': rng.randint(1, venues),
+            'artist_id': rng.randint(1, artists),
+            'time': now + datetime.timedelta(minutes=rng.randint(-525600, 525600)),
+        } for i in range(start + 1, min(start + chunk_size, shows) + 1)])
+
+    # The show counts of venues and artists, as of the seeding.
+    for model, column in SHOW_OWNERS:
+        recount_shows(model, column, now=now)
+    db.session.add(ShowCountRollover(id=1, rolled_over_at=now))
+
+    db.session.commit()
@@ -0,0 +1,102 @@
+"""Startup benchmark for Fyyur.
+
+Starts the app in fresh processes and reports the time to create it and
+the latency of the first request to each route (cold, with nothing
+compiled or loaded) against the second one (warm), in three setups:
+templates compiled on demand, loaded from a bytecode cache filled by
+``flask compile-templates``, and that cache plus ``TEMPLATE_PRELOAD``.
+The routes render templates without touching seeded data, so an empty
+SQLite database is enough.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ('/', '/venues', '/artists', '/shows',
+          '/venues/create', '/artists/create', '/shows/create')
+
+# Run in the child process: create the app, create the schema, then time
+# two requests per route.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app, db
+app = create_app()
+created = time.perf_counter() - start
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+timings = {'create app': created * 1000}
+for url in sys.argv[1:]:
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        timings[url + ' ' + label] = (time.perf_counter() - start) * 1000
+        assert response.status_code == 200, (url, response.status_code)
+print(json.dumps(timings))
+'''
+
+
+def probe(env):
+    process = subprocess.run([sys.executable, '-c', PROBE] + list(ROUTES), cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode:
+        sys.stderr.write(process.stderr.decode('utf-8', 'replace'))
+        raise SystemExit('The startup probe failed.')
+    return json.loads(process.stdout.decode('utf-8').strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='processes started per setup')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='fyyur-startup-')
+    cache_dir = os.path.join(workdir, 'templates')
+    base = dict(os.environ, CACHE_TYPE='null', PYTHONDONTWRITEBYTECODE='1', SECRET_KEY='benchmark',
+                DATABASE_URL='sqlite:///' + os.path.join(workdir, 'fyyur.db'))
+    base.pop('DATABASE_REPLICA_URL', None)
+    for name in ('TEMPLATE_CACHE_DIR', 'TEMPLATE_PRELOAD'):
+        base.pop(name, None)
+    cached = dict(base, TEMPLATE_CACHE_DIR=cache_dir)
+    setups = [
+        ('no cache', base),
+        ('bytecode cache', cached),
+        ('cache + preload', dict(cached, TEMPLATE_PRELOAD='1')),
+    ]
+
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', 'compile-templates'], cwd=ROOT,
+                       env=dict(cached, FLASK_APP='app'), check=True, stdout=subprocess.DEVNULL)
+        results = {}
+        for name, env in setups:
+            runs = [probe(env) for _ in range(args.runs)]
+            results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    names = [name for name, _ in setups]
+    print('Median of {} processes, ms'.format(args.runs))
+    print('{:<26}'.format('') + ''.join('{:>18}'.format(name) for name in names))
+    rows = ['create app'] + ['{} {}'.format(url, label) for url in ROUTES for label in ('cold', 'warm')]
+    for row in rows:
+        print('{:<26}'.format(row) + ''.join('{:>18.2f}'.format(results[name][row]) for name in names))
+    for label in ('cold', 'warm'):
+        print('{:<26}'.format('total first requests' if label == 'cold' else 'total second requests')
+              + ''.join('{:>18.2f}'.format(sum(results[name]['{} {}'.format(url, label)]
+                                               for url in ROUTES)) for name in names))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
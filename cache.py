@@ -0,0 +1,286 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+from conditional import shared_page
+
+
+class NullCache(object):
+    """Backend that never stores anything, used to switch caching off."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class LRUCache(object):
+    """In-process least recently used cache with a per-entry time to live.
+
+    ``timeout`` is in seconds, ``0`` keeps the entry until it is evicted.
+    """
+
+    def __init__(self, threshold=500, default_timeout=300):
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout else 0
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.threshold:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemCache(object):
+    """Cache stored as one pickle file per key in ``cache_dir``.
+
+    Every worker process on the host shares the same entries. Writes go
+    through a temporary file and ``os.replace`` so readers never see a
+    partial entry.
+    """
+
+    def __init__(self, cache_dir, threshold=500, default_timeout=300):
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _files(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if not name.startswith('.')]
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout else 0
+        self._prune()
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for path in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        files = self._files()
+        if len(files) < self.threshold:
+            return
+        # Drop the least recently written half.
+        files.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in files[:len(files) // 2]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._files())
+
+
+class ResponseCache(object):
+    """Cache of rendered GET responses, keyed by path, query string and tags.
+
+    Each cached view declares tags such as ``'venues'`` or
+    ``'venue:{venue_id}'`` (formatted with the view arguments). Every tag
+    has a version stored in the backend and the versions are part of the
+    cache key, so ``invalidate(tag)`` retires every page carrying that tag
+    without having to enumerate the keys.
+
+    Configured with ``CACHE_TYPE`` (``'simple'``, ``'filesystem'`` or
+    ``'null'``), ``CACHE_DEFAULT_TIMEOUT``, ``CACHE_THRESHOLD`` and
+    ``CACHE_DIR``.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'simple')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_THRESHOLD', 500)
+        app.config.setdefault('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+
+        cache_type = app.config['CACHE_TYPE']
+        options = dict(threshold=app.config['CACHE_THRESHOLD'],
+                       default_timeout=app.config['CACHE_DEFAULT_TIMEOUT'])
+        if cache_type == 'simple':
+            self.backend = LRUCache(**options)
+        elif cache_type == 'filesystem':
+            self.backend = FileSystemCache(app.config['CACHE_DIR'], **options)
+        elif cache_type == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+
+        app.extensions['page_cache'] = self
+
+    def _tag_version(self, tag):
+        version = self.backend.get('tag:' + tag)
+        if version is None:
+            # A tag without a version (never seen or evicted) gets a fresh
+            # one, so no entry cached under an older version can match.
+            version = self._new_version()
+            self.backend.set('tag:' + tag, version, timeout=0)
+        return version
+
+    def _new_version(self):
+        return '{:x}'.format(time.time_ns())
+
+    def _key(self, tags, etag=None):
+        versions = ','.join('{}={}'.format(tag, self._tag_version(tag)) for tag in tags)
+        query = '&'.join('{}={}'.format(name, value)
+                         for name, value in sorted(request.args.items(multi=True)))
+        return 'page:{}?{}|{}|{}'.format(request.path, query, versions, etag or '')
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set('tag:' + tag, self._new_version(), timeout=0)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+        }
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, tags, etag=None):
+        """Return the cache key of the current request for a page carrying
+        ``tags`` and the cached response, or ``None`` on a miss.
+
+        ``etag`` is the version of the page sent to clients, when it has
+        one: a page changing without a write (a show starting) gets a new
+        entry rather than the old body under the new ETag."""
+        key = self._key(tags, etag)
+        entry = self.backend.get(key)
+        self._count(hit=entry is not None)
+        if entry is None:
+            return key, None
+        body, status, headers = entry
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers['X-Cache'] = 'HIT'
+        return key, response
+
+    def store(self, key, response, timeout=None):
+        """Cache ``response`` under ``key`` if it is a complete 200."""
+        if response.status_code == 200 and not response.direct_passthrough:
+            self.backend.set(key, (response.get_data(),
+                                   response.status_code,
+                                   [('Content-Type', response.content_type)]),
+                             timeout=timeout)
+        response.headers['X-Cache'] = 'MISS'
+
+    def cacheable(self):
+        return shared_page()
+
+    def cached(self, *tags, timeout=None):
+        """Decorate a view so its successful GET responses are cached."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.cacheable():
+                    return view(**kwargs)
+
+                # Set by ConditionalGet.versioned, which runs first.
+                key, response = self.lookup([tag.format(**kwargs) for tag in tags],
+                                            g.get('page_etag'))
+                if response is not None:
+                    return response
+
+                response = current_app.make_response(view(**kwargs))
+                self.store(key, response, timeout)
+                return response
+            return wrapper
+        return decorator
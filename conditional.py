@@ -0,0 +1,109 @@
+import datetime
+import functools
+import hashlib
+import os
+
+from flask import current_app, g, request, session
+from werkzeug.http import is_resource_modified
+
+
+def shared_page():
+    """Whether the current request is for a page the same for every
+    client, which may be validated and cached."""
+    # Pages rendered with pending flash messages are user specific.
+    return request.method == 'GET' and '_flashes' not in session
+
+
+class ConditionalGet(object):
+    """ETag and Last-Modified validators for GET views, with ``304 Not
+    Modified`` answered before the view runs.
+
+    A view declares a version function, called with the database session
+    and the view arguments, that returns ``(last_modified, values)`` from
+    one cheap query, or ``None`` to let the view handle the request (a
+    missing row, say). ``values`` are whatever identifies the state of the
+    page, hashed into a weak ETag together with ``ETAG_SALT``. By default
+    the salt is the modification time of the newest template and the
+    version of the built assets, so a deploy that changes the markup does
+    not leave clients on the old pages.
+
+    Last-Modified cannot see deletions; the version values can (a row
+    count, for instance), and an ``If-None-Match`` takes precedence over
+    ``If-Modified-Since``.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.salt = ''
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        app.config.setdefault('ETAG_SALT', None)
+        if db is not None:
+            self.db = db
+
+        self.salt = app.config['ETAG_SALT']
+        if self.salt is None:
+            assets = app.extensions.get('assets')
+            self.salt = '{:.0f}:{}'.format(
+                newest_mtime(os.path.join(app.root_path, app.template_folder)),
+                assets.version if assets is not None else '')
+
+        app.extensions['conditional_get'] = self
+
+    def validators(self, version):
+        """``(etag, last_modified)`` of a ``version`` function result."""
+        last_modified, values = version
+        digest = hashlib.sha1(repr((self.salt, values)).encode('utf-8')).hexdigest()
+        return digest[:32], last_modified
+
+    def not_modified(self, etag, last_modified):
+        """A ``304`` response if the client has this version, else ``None``."""
+        if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return None
+        return self.add_validators(current_app.response_class(status=304), etag, last_modified)
+
+    def add_validators(self, response, etag, last_modified):
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+        # Stored by clients but checked with us before each reuse.
+        response.cache_control.no_cache = True
+        return response
+
+    def applies(self):
+        return shared_page()
+
+    def versioned(self, version):
+        """Decorate a view with the validators of ``version``."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.applies():
+                    return view(**kwargs)
+                current = version(self.db.session, **kwargs)
+                if current is None:
+                    return view(**kwargs)
+
+                etag, last_modified = self.validators(current)
+                # For the page cache, see ResponseCache.lookup.
+                g.page_etag = etag
+                response = self.not_modified(etag, last_modified)
+                if response is not None:
+                    return response
+
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code == 200:
+                    self.add_validators(response, etag, last_modified)
+                return response
+            return wrapper
+        return decorator
+
+
+def newest_mtime(directory):
+    newest = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return newest
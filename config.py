@@ -1,13 +1,119 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Shared by every worker, so it must come from the environment (when it is
+# unset, each process makes up its own, see create_app).
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode with FLASK_DEBUG=1.
+DEBUG = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
 
 # Connect to the database
 
-SQLALCHEMY_DATABASE_URI = 'postgres://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://postgres@localhost:5432/fyyur')
 
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+# Register `flask db`. Web workers can set MIGRATIONS=0 to start without
+# importing alembic.
+MIGRATIONS = os.environ.get('MIGRATIONS', '1') == '1'
+
+# Optional read replica. Views marked @db.reads_from_replica query it, and
+# a client that just wrote reads from the primary for a few seconds.
+SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} \
+    if os.environ.get('DATABASE_REPLICA_URL') else {}
+SQLALCHEMY_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+
+# Connection pool, per engine (pool sizes are ignored for SQLite).
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1',
+}
+
+# Async URLs for asgi.py, by default the ones above with asyncpg/aiosqlite.
+ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+ASYNC_DATABASE_REPLICA_URL = os.environ.get('ASYNC_DATABASE_REPLICA_URL')
+
+# Statement timeout in ms on Postgres, 0 for none.
+SQLALCHEMY_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 0))
+
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Number of rows per page on the listing pages (?limit= is capped at the max).
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Mixed into the ETags of the pages; by default the modification time of
+# the newest template and the version of the built assets, so a deploy
+# changing the markup changes them.
+ETAG_SALT = os.environ.get('ETAG_SALT')
+
+# Fingerprinted static files (`flask build-assets`), in this folder of the
+# static folder and cached by browsers for a year.
+ASSETS_FOLDER = 'dist'
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Template bytecode cache, filled by `flask compile-templates` (unset, each
+# process compiles the templates it renders), and whether every template is
+# loaded at startup rather than on its first request.
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+TEMPLATE_PRELOAD = os.environ.get('TEMPLATE_PRELOAD', '0') == '1'
+
+# Application log: records go through a queue to a writer thread, into
+# LOG_FILE rotated at LOG_MAX_BYTES (stderr in debug mode, or when empty).
+LOG_FILE = os.environ.get('LOG_FILE', os.path.join(basedir, 'error.log'))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Maximum number of results returned by the venue and artist searches.
+SEARCH_RESULTS_LIMIT = 50
+
+# Name autocompletion: suggestions per kind (?limit= is capped at the max),
+# and whether the prefix indexes are built at startup, giving up after the
+# timeout (seconds) and leaving it to the first request.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_PRELOAD = os.environ.get('AUTOCOMPLETE_PRELOAD', '0') == '1'
+AUTOCOMPLETE_LOAD_TIMEOUT = float(os.environ.get('AUTOCOMPLETE_LOAD_TIMEOUT', '2'))
+
+# Rendered page cache: 'simple' (in-process LRU), 'filesystem' or 'null'.
+# 'simple' is per process: use 'filesystem' with several workers, so that
+# writes invalidate the pages of all of them.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_THRESHOLD = 500
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(basedir, '.cache'))
+
+# Per-request SQL counting. Going over the budget logs a warning, or raises
+# QueryBudgetExceeded when SQL_QUERY_BUDGET_ACTION is 'raise'.
+SQL_INSTRUMENTATION = True
+SQL_REPEATED_QUERY_THRESHOLD = 5
+SQL_QUERY_BUDGET = 10
+SQL_QUERY_BUDGETS = {}
+SQL_QUERY_BUDGET_ACTION = 'warn'
+
+# JSON API: rows per page (?limit= is capped at the max) and rows fetched
+# per round trip from the server-side cursor.
+API_PAGE_SIZE = 500
+API_MAX_PAGE_SIZE = 10000
+API_YIELD_PER = 500
+
+# Batch show creation: shows accepted per request, all in one transaction,
+# and rows per multi-row INSERT, of 4 parameters each (SQLite before 3.32
+# takes at most 999 parameters per statement: 200 rows there).
+SHOW_BATCH_MAX_ROWS = 1000
+SHOW_BATCH_INSERT_SIZE = 500
+
+# Rows per batch (and per transaction) for `flask import-data`.
+IMPORT_CHUNK_SIZE = 1000
+
+# Rows fetched per round trip by the bulk exports.
+EXPORT_YIELD_PER = 1000
+
+# Display locale and time zone of dates (stored times are UTC), and how
+# many formatted values are kept.
+DATETIME_LOCALE = 'en_US'
+DATETIME_TIMEZONE = os.environ.get('DATETIME_TIMEZONE', 'UTC')
+DATETIME_CACHE_SIZE = 4096
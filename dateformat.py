@@ -0,0 +1,79 @@
+import datetime
+import functools
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import get_timezone, parse_pattern
+
+
+#: Named formats, anything else is used as a babel pattern.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compile_format(locale, format, timezone):
+    """Compiled pattern, locale and tzinfo of ``(locale, format, timezone)``."""
+    return (parse_pattern(FORMATS.get(format, format)),
+            Locale.parse(locale),
+            get_timezone(timezone))
+
+
+class DateTimeFormatter(object):
+    """Babel datetime formatting with the expensive parts done once.
+
+    Patterns are compiled once per ``(locale, format, timezone)``, and
+    formatted values are kept in a bounded LRU so the same show time on a
+    page (or on the next request) costs a dictionary lookup. Values are
+    ``datetime`` objects, naive ones being UTC; strings are still accepted
+    and parsed, for templates that pass them.
+
+    Configured with ``DATETIME_LOCALE``, ``DATETIME_TIMEZONE`` (the zone
+    times are shown in) and ``DATETIME_CACHE_SIZE``.
+    """
+
+    def __init__(self, app=None):
+        self.locale = 'en_US'
+        self.timezone = 'UTC'
+        self._format = functools.lru_cache(maxsize=4096)(self._format_uncached)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATETIME_LOCALE', 'en_US')
+        app.config.setdefault('DATETIME_TIMEZONE', 'UTC')
+        app.config.setdefault('DATETIME_CACHE_SIZE', 4096)
+
+        self.locale = app.config['DATETIME_LOCALE']
+        self.timezone = app.config['DATETIME_TIMEZONE']
+        self._format = functools.lru_cache(
+            maxsize=app.config['DATETIME_CACHE_SIZE'])(self._format_uncached)
+
+        app.extensions['datetime_formatter'] = self
+
+    def _format_uncached(self, value, format, locale, timezone):
+        pattern, locale, tzinfo = compile_format(locale, format, timezone)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return pattern.apply(value.astimezone(tzinfo), locale)
+
+    def format(self, value, format='medium', locale=None, timezone=None):
+        """Format one datetime (or datetime string)."""
+        if value is None:
+            return ''
+        if isinstance(value, str):
+            value = dateutil.parser.parse(value)
+        return self._format(value, format, locale or self.locale, timezone or self.timezone)
+
+    def format_many(self, values, format='medium', locale=None, timezone=None):
+        """Format a list of datetimes at once, each distinct value once."""
+        formatted = {}
+        for value in values:
+            if value not in formatted:
+                formatted[value] = self.format(value, format, locale, timezone)
+        return [formatted[value] for value in values]
+
+    def cache_info(self):
+        return self._format.cache_info()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, TextAreaField, FileField
 from wtforms.validators import DataRequired, AnyOf, URL, Length
 
 
@@ -17,6 +17,14 @@ class ShowForm(Form):
         default= datetime.today()
     )
 
+class ShowBatchForm(Form):
+    shows = TextAreaField(
+        'shows'
+    )
+    file = FileField(
+        'file'
+    )
+
 class VenueForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
@@ -0,0 +1,278 @@
+"""Bulk loading of venues, artists and shows from CSV or NDJSON files.
+
+Records are read lazily and processed in chunks. Each chunk is
+deduplicated in memory and against the database, its foreign keys and
+genres are resolved with one ``IN`` query per table, its rows go in with
+``COPY`` on Postgres or a multi-row insert elsewhere, and it is committed
+on its own.
+"""
+import csv
+import datetime
+import io
+import json
+import os
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+from app import db, count_new_shows, parse_time, Artist, Genre, Show, Venue, artist_genre, venue_genre
+
+
+VENUE_COLUMNS = ('name', 'city', 'state', 'address', 'phone', 'image_link',
+                 'facebook_link', 'website', 'seeking_talent', 'seeking_description')
+
+ARTIST_COLUMNS = ('name', 'city', 'state', 'phone', 'image_link',
+                  'facebook_link', 'website', 'seeking_venue', 'seeking_description')
+
+BOOLEAN_COLUMNS = {'seeking_talent', 'seeking_venue'}
+
+# Venue listing keys, NOT NULL: a missing city or state is stored empty.
+VENUE_KEY_COLUMNS = {'city', 'state'}
+
+
+class ImportResult(object):
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def __str__(self):
+        return '{}: {} inserted, {} duplicates skipped, {} errors'.format(
+            self.entity, self.inserted, self.duplicates, len(self.errors))
+
+
+class InvalidLine(object):
+    """Read in place of the record of an NDJSON line that holds none, and
+    reported as an error of that line."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_records(path, format=None):
+    """Yield ``(line, record)`` pairs from a CSV or NDJSON file, with an
+    ``InvalidLine`` for a line that is not a JSON object."""
+    format = format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            # Line 1 is the header.
+            for line, record in enumerate(csv.DictReader(f), 2):
+                yield line, record
+        else:
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError:
+                    yield line, InvalidLine('invalid JSON')
+                    continue
+                if not isinstance(record, dict):
+                    record = InvalidLine('not a JSON object')
+                yield line, record
+
+
+def valid_records(records, result):
+    """Pass on the records, reporting the invalid lines in ``result``."""
+    for line, record in records:
+        if isinstance(record, InvalidLine):
+            result.error(line, record.message)
+        else:
+            yield line, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def name_key(name):
+    return (name or '').strip().lower()
+
+
+def parse_boolean(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y')
+
+
+def parse_genres(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return list(dict.fromkeys(name.strip() for name in value if name.strip()))
+
+
+def lookup_ids(model, keys):
+    """Map lower-cased names to ids for the rows of ``model`` named ``keys``."""
+    if not keys:
+        return {}
+    return dict(db.session.query(db.func.lower(model.name), model.id).filter(
+        db.func.lower(model.name).in_(list(keys))))
+
+
+def insert_rows(table, columns, rows):
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        # COPY does not apply the column defaults set on the Python side.
+        now = datetime.datetime.utcnow()
+        columns = tuple(columns) + ('updated_at',)
+        rows = [dict(row, updated_at=now) for row in rows]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row.get(column) for column in columns])
+        buffer.seek(0)
+        preparer = connection.dialect.identifier_preparer
+        statement = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            preparer.format_table(table),
+            ', '.join(preparer.quote(column) for column in columns))
+        connection.connection.cursor().copy_expert(statement, buffer)
+    else:
+        connection.execute(table.insert(), rows)
+
+
+def genre_ids(names):
+    """Ids of the genres called ``names``, creating the missing ones."""
+    if not names:
+        return {}
+    ids = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(list(names))))
+    missing = [{'name': name} for name in names if name not in ids]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), missing)
+        ids.update(db.session.query(Genre.name, Genre.id).filter(
+            Genre.name.in_([row['name'] for row in missing])))
+    return ids
+
+
+def _import_named(entity, model, columns, association, owner_column, records, chunk_size,
+                  not_null=()):
+    result = ImportResult(entity)
+    seen = set()
+
+    for chunk in chunked(valid_records(records, result), chunk_size):
+        rows = {}
+        genres = {}
+        for line, record in chunk:
+            if not isinstance(record.get('name') or '', str):
+                result.error(line, 'invalid name')
+                continue
+            key = name_key(record.get('name'))
+            if not key:
+                result.error(line, 'missing name')
+                continue
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            rows[key] = {column: parse_boolean(record.get(column))
+                         if column in BOOLEAN_COLUMNS else (record.get(column) or None)
+                         for column in columns}
+            for column in not_null:
+                rows[key][column] = rows[key][column] or ''
+            rows[key]['name'] = record['name'].strip()
+            genres[key] = parse_genres(record.get('genres'))
+
+        for key in lookup_ids(model, rows):
+            del rows[key]
+            result.duplicates += 1
+
+        insert_rows(model.__table__, columns, list(rows.values()))
+        result.inserted += len(rows)
+
+        ids = lookup_ids(model, rows)
+        genre_id = genre_ids({name for key in rows for name in genres[key]})
+        links = [{owner_column: ids[key], 'genre_id': genre_id[name]}
+                 for key in rows for name in genres[key]]
+        if links:
+            db.session.execute(association.insert(), links)
+
+        db.session.commit()
+
+    return result
+
+
+def import_venues(records, chunk_size):
+    return _import_named('venues', Venue, VENUE_COLUMNS, venue_genre, 'venue_id',
+                         records, chunk_size, not_null=VENUE_KEY_COLUMNS)
+
+
+def import_artists(records, chunk_size):
+    return _import_named('artists', Artist, ARTIST_COLUMNS, artist_genre, 'artist_id',
+                         records, chunk_size)
+
+
+def _resolve(model, chunk, field):
+    """Map each record's ``<field>_id`` or ``<field>`` name to an existing id."""
+    names = {name_key(record.get(field)) for _, record in chunk
+             if not record.get(field + '_id') and record.get(field)}
+    ids = {int(record[field + '_id']) for _, record in chunk
+           if str(record.get(field + '_id') or '').strip().isdigit()}
+    by_name = lookup_ids(model, names)
+    known = {id for id, in db.session.query(model.id).filter(model.id.in_(list(ids)))} if ids else set()
+
+    def resolve(record):
+        if record.get(field + '_id'):
+            value = str(record[field + '_id']).strip()
+            return int(value) if value.isdigit() and int(value) in known else None
+        return by_name.get(name_key(record.get(field)))
+    return resolve
+
+
+def import_shows(records, chunk_size):
+    """Shows reference their venue and artist by ``venue_id``/``artist_id``
+    or by ``venue``/``artist`` name."""
+    result = ImportResult('shows')
+    seen = set()
+
+    for chunk in chunked(valid_records(records, result), chunk_size):
+        venue_id = _resolve(Venue, chunk, 'venue')
+        artist_id = _resolve(Artist, chunk, 'artist')
+
+        rows = {}
+        for line, record in chunk:
+            row = {'venue_id': venue_id(record), 'artist_id': artist_id(record)}
+            if row['venue_id'] is None:
+                result.error(line, 'unknown venue')
+                continue
+            if row['artist_id'] is None:
+                result.error(line, 'unknown artist')
+                continue
+            try:
+                row['time'] = parse_time(record.get('start_time') or record.get('time'))
+            except (ValueError, OverflowError):
+                result.error(line, 'invalid start_time')
+                continue
+            key = (row['venue_id'], row['artist_id'], row['time'])
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            rows[key] = row
+
+        if rows:
+            existing = db.session.query(Show.venue_id, Show.artist_id, Show.time).filter(
+                tuple_(Show.venue_id, Show.artist_id, Show.time).in_(list(rows)))
+            for key in existing:
+                if tuple(key) in rows:
+                    del rows[tuple(key)]
+                    result.duplicates += 1
+
+        insert_rows(Show.__table__, ('venue_id', 'artist_id', 'time'), list(rows.values()))
+        count_new_shows(list(rows.values()))
+        result.inserted += len(rows)
+        db.session.commit()
+
+    return result
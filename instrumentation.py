@@ -0,0 +1,147 @@
+import functools
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# A list under this key of the WSGI environ gets the stats of the request,
+# which a test client reads once the body is closed (a streamed body runs
+# its queries after the headers).
+ENVIRON_KEY = 'fyyur.query_stats'
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more queries than its budget allows and
+    ``SQL_QUERY_BUDGET_ACTION`` is ``'raise'``."""
+
+
+_whitespace = re.compile(r'\s+')
+_string = re.compile(r"'(?:[^']|'')*'")
+_number = re.compile(r'\b\d+(?:\.\d+)?\b')
+_placeholder = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_in_list = re.compile(r'\(\s*{0}(?:\s*,\s*{0})*\s*\)'.format(_placeholder))
+
+
+def fingerprint(statement):
+    """Reduce ``statement`` to its shape: literals and parameter lists are
+    replaced so the same query with other values gives the same string."""
+    statement = _whitespace.sub(' ', statement).strip()
+    statement = _string.sub('?', statement)
+    statement = _number.sub('?', statement)
+    return _in_list.sub('(?)', statement)
+
+
+class QueryStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        return {statement: count for statement, count in self.fingerprints.items()
+                if count >= threshold}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start_time'].pop()
+    if has_request_context():
+        stats = g.get('query_stats')
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - start)
+
+
+class SQLInstrumentation(object):
+    """Count and time the SQL statements run by each request.
+
+    Every response gets ``X-DB-Query-Count``, ``X-DB-Query-Time`` (ms) and
+    ``X-DB-Repeated-Queries`` headers, except streamed ones (the exports),
+    whose queries run after the headers are sent: they are counted until
+    the body is closed, and only logged and checked against the budget. A statement shape run at least
+    ``SQL_REPEATED_QUERY_THRESHOLD`` times in one request is reported as a
+    likely N+1. ``SQL_QUERY_BUDGET`` (or a per-endpoint entry in
+    ``SQL_QUERY_BUDGETS``) caps the number of queries; going over it logs a
+    warning, or raises ``QueryBudgetExceeded`` when
+    ``SQL_QUERY_BUDGET_ACTION`` is ``'raise'`` (meant for tests).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', True)
+        app.config.setdefault('SQL_REPEATED_QUERY_THRESHOLD', 5)
+        app.config.setdefault('SQL_QUERY_BUDGET', None)
+        app.config.setdefault('SQL_QUERY_BUDGETS', {})
+        app.config.setdefault('SQL_QUERY_BUDGET_ACTION', 'warn')
+
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['sql_instrumentation'] = self
+
+    def current(self):
+        """Stats of the running request, or ``None`` outside of one."""
+        return g.get('query_stats') if has_request_context() else None
+
+    def _start(self):
+        g.query_stats = QueryStats()
+        collected = request.environ.get(ENVIRON_KEY)
+        if collected is not None:
+            collected.append(g.query_stats)
+
+    def _finish(self, response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        report = functools.partial(self._report, current_app._get_current_object(), stats,
+                                   request.method, request.path, request.endpoint)
+        if response.is_streamed:
+            # The headers are sent before a streamed body runs its queries:
+            # those are only logged and held to the budget once it is closed.
+            response.call_on_close(report)
+            return response
+
+        repeated = stats.repeated(current_app.config['SQL_REPEATED_QUERY_THRESHOLD'])
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Query-Time'] = '{:.2f}'.format(stats.duration * 1000)
+        response.headers['X-DB-Repeated-Queries'] = str(len(repeated))
+        report()
+        return response
+
+    def _report(self, app, stats, method, path, endpoint):
+        if app.debug:
+            app.logger.info('%s %s: %d queries in %.2f ms',
+                            method, path, stats.count, stats.duration * 1000)
+            repeated = stats.repeated(app.config['SQL_REPEATED_QUERY_THRESHOLD'])
+            for statement, count in repeated.items():
+                app.logger.warning('Possible N+1 on %s: %d x %s', path, count, statement)
+
+        budget = app.config['SQL_QUERY_BUDGETS'].get(endpoint, app.config['SQL_QUERY_BUDGET'])
+        if budget is not None and stats.count > budget:
+            message = '{} ran {} queries, over its budget of {}'.format(
+                endpoint, stats.count, budget)
+            if app.config['SQL_QUERY_BUDGET_ACTION'] == 'raise':
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
@@ -0,0 +1,131 @@
+"""Application logging off the request thread.
+
+Records of the app logger are formatted where they are made, then put on
+an in-memory queue that a background thread writes to ``LOG_FILE``,
+rotated every ``LOG_MAX_BYTES`` (keeping ``LOG_BACKUP_COUNT`` old files),
+or to stderr in debug mode or without a file. A request never waits on
+the disk or the terminal, only on an unbounded queue.
+
+Each request gets a correlation id, taken from its ``X-Request-ID`` header
+when it has a sane one and made up otherwise, which is sent back in the
+response header of the same name and stamped on every record the request
+logs, so the lines of one request can be picked out of the file.
+"""
+import atexit
+import logging
+import os
+import queue
+import re
+import sys
+import uuid
+import weakref
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Ids from the client are logged as they are, so they are kept short and plain.
+_request_id = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+# Listeners running in this process. The thread of a forked worker's parent
+# is gone in the worker, and the queue lock may have been held by it.
+_listeners = weakref.WeakSet()
+
+
+def _restart_listeners():
+    for logs in list(_listeners):
+        logs._start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listeners)
+
+
+def request_id():
+    """Correlation id of the running request, or ``None`` outside of one."""
+    return g.get('request_id') if has_request_context() else None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the ``request_id`` of the request making them,
+    ``-`` outside of one."""
+
+    def filter(self, record):
+        record.request_id = request_id() or '-'
+        return True
+
+
+class QueueLogging(object):
+    """Sends the records of ``app.logger`` through a queue to a writer
+    thread, and gives every request a correlation id.
+
+    Configured with ``LOG_FILE``, ``LOG_LEVEL``, ``LOG_FORMAT``,
+    ``LOG_MAX_BYTES`` and ``LOG_BACKUP_COUNT``.
+    """
+
+    def __init__(self, app=None):
+        self.handler = None
+        self.listener = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_FILE', 'error.log')
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault(
+            'LOG_FORMAT',
+            '%(asctime)s %(levelname)s [%(request_id)s]: %(message)s [in %(pathname)s:%(lineno)d]')
+        app.config.setdefault('LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('LOG_BACKUP_COUNT', 5)
+
+        self.app = app
+        # An app made again in the same process (scripts, benchmarks) logs
+        # through the same logger.
+        self._stop()
+        if app.debug or not app.config['LOG_FILE']:
+            self.target = logging.StreamHandler(sys.stderr)
+        else:
+            self.target = RotatingFileHandler(
+                app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+                backupCount=app.config['LOG_BACKUP_COUNT'], delay=True, encoding='utf-8')
+
+        self.handler = QueueHandler(queue.SimpleQueue())
+        self.handler.addFilter(RequestIdFilter())
+        # QueueHandler.prepare formats the record on the calling thread, in
+        # full: the writer only has to write the line.
+        self.handler.setFormatter(logging.Formatter(app.config['LOG_FORMAT']))
+        app.logger.removeHandler(default_handler)
+        app.logger.addHandler(self.handler)
+        app.logger.setLevel(app.config['LOG_LEVEL'])
+        self._start()
+        _listeners.add(self)
+        atexit.unregister(self._stop)
+        atexit.register(self._stop)
+
+        app.before_request(self._assign_request_id)
+        app.after_request(self._send_request_id)
+        app.extensions['queue_logging'] = self
+
+    def _start(self):
+        self.handler.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.handler.queue, self.target)
+        self.listener.start()
+
+    def _stop(self):
+        """Write out the queued records and stop the writer thread."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+            self.target.close()
+        if self.handler is not None:
+            self.app.logger.removeHandler(self.handler)
+
+    def _assign_request_id(self):
+        given = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = given if _request_id.match(given) else uuid.uuid4().hex
+
+    def _send_request_id(self, response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
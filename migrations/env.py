@@ -3,6 +3,7 @@ from __future__ import with_statement
 import logging
 from logging.config import fileConfig
 
+from sqlalchemy import Column
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
@@ -27,6 +28,16 @@ config.set_main_option(
         'SQLALCHEMY_DATABASE_URI').replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Expression indexes such as lower(name) are not reflected by every
+    # backend, so autogenerate would add them again on each run. Their
+    # migrations are written by hand.
+    if type_ == 'index' and not reflected:
+        return all(isinstance(expression, Column) for expression in object.expressions)
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,7 +58,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -83,6 +95,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
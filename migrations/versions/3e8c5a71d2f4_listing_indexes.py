@@ -0,0 +1,28 @@
+"""btree indexes for the venue, artist and show listings
+
+Revision ID: 3e8c5a71d2f4
+Revises: b47d2c9e15f3
+Create Date: 2020-03-17 09:12:37.402518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8c5a71d2f4'
+down_revision = 'b47d2c9e15f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_state_city_name_id', 'venue',
+                    ['state', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.create_index('ix_show_time_id', 'show', ['time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_time_id', table_name='show')
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.drop_index('ix_venue_state_city_name_id', table_name='venue')
@@ -0,0 +1,95 @@
+"""show time as indexed timestamp
+
+Revision ID: 5c1f0e7b2a94
+Revises: d7aeddc6a2d6
+Create Date: 2020-03-14 11:02:37.214518
+
+"""
+import datetime
+import logging
+
+import dateutil.parser
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7b2a94'
+down_revision = 'd7aeddc6a2d6'
+branch_labels = None
+depends_on = None
+
+
+logger = logging.getLogger('alembic.env')
+
+show = sa.table('show',
+    sa.column('id', sa.Integer),
+    sa.column('venue_id', sa.Integer),
+    sa.column('artist_id', sa.Integer),
+    sa.column('time', sa.String),
+    sa.column('time_at', sa.DateTime))
+
+
+def parse_time(value):
+    """The naive UTC timestamp of a stored time string, or ``None``."""
+    if not isinstance(value, str):
+        return None
+    try:
+        # ISO times, as the seed data has them, are read without dateutil.
+        time = datetime.datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            time = dateutil.parser.parse(value)
+        except (ValueError, OverflowError):
+            return None
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return time
+
+
+def upgrade():
+    # The strings are parsed here rather than cast by the database: SQLite
+    # casts '2019-05-21T21:30:00' to 2019, and Postgres stops at the first
+    # string it cannot read.
+    connection = op.get_bind()
+    times, unreadable = [], []
+    for id, venue_id, artist_id, value in connection.execute(
+            sa.select(show.c.id, show.c.venue_id, show.c.artist_id, show.c.time)):
+        time = parse_time(value)
+        if time is None:
+            unreadable.append(id)
+            logger.error('Show %s (venue %s, artist %s) has an unreadable time %r',
+                         id, venue_id, artist_id, value)
+        else:
+            times.append({'show_id': id, 'time_at': time})
+
+    # Before anything is changed: the shows are not ours to drop.
+    if unreadable:
+        raise RuntimeError(
+            '{} shows have a time that cannot be read (ids {}{}). Set their time, or '
+            'delete them, and upgrade again.'.format(
+                len(unreadable), ', '.join(map(str, unreadable[:20])),
+                ', ...' if len(unreadable) > 20 else ''))
+
+    op.add_column('show', sa.Column('time_at', sa.DateTime(), nullable=True))
+    if times:
+        connection.execute(show.update().where(show.c.id == sa.bindparam('show_id')).values(
+            time_at=sa.bindparam('time_at')), times)
+
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_column('time')
+        batch_op.alter_column('time_at', new_column_name='time',
+               existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_show_venue_id_time', 'show', ['venue_id', 'time'], unique=False)
+    op.create_index('ix_show_artist_id_time', 'show', ['artist_id', 'time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_time', table_name='show')
+    op.drop_index('ix_show_venue_id_time', table_name='show')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.alter_column('time',
+               existing_type=sa.DateTime(),
+               type_=sa.String(length=20),
+               nullable=True,
+               postgresql_using="to_char(time, 'YYYY-MM-DD HH24:MI:SS')")
@@ -0,0 +1,55 @@
+"""case-insensitive unique venue and artist names
+
+Revision ID: 6f2d8b4a9c13
+Revises: 3e8c5a71d2f4
+Create Date: 2020-03-18 20:47:03.118352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2d8b4a9c13'
+down_revision = '3e8c5a71d2f4'
+branch_labels = None
+depends_on = None
+
+
+def merge_duplicates(table, association, owner_column):
+    """Fold rows whose names only differ by case into the oldest one: their
+    shows and genres move over and the copies are deleted."""
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        'SELECT id, lower(name) FROM {} WHERE name IS NOT NULL ORDER BY id'.format(table)))
+    keep = {}
+    duplicates = {}
+    for id, name in rows:
+        if name in keep:
+            duplicates[id] = keep[name]
+        else:
+            keep[name] = id
+
+    for duplicate, kept in duplicates.items():
+        params = {'duplicate': duplicate, 'kept': kept}
+        bind.execute(sa.text(
+            'UPDATE "show" SET {0} = :kept WHERE {0} = :duplicate'.format(owner_column)), params)
+        bind.execute(sa.text(
+            'INSERT INTO {0} ({1}, genre_id) SELECT :kept, genre_id FROM {0} '
+            'WHERE {1} = :duplicate AND genre_id NOT IN '
+            '(SELECT genre_id FROM {0} WHERE {1} = :kept)'.format(association, owner_column)), params)
+        bind.execute(sa.text(
+            'DELETE FROM {} WHERE {} = :duplicate'.format(association, owner_column)), params)
+        bind.execute(sa.text('DELETE FROM {} WHERE id = :duplicate'.format(table)), params)
+
+
+def upgrade():
+    merge_duplicates('venue', 'venue_genre', 'venue_id')
+    merge_duplicates('artist', 'artist_genre', 'artist_id')
+    op.create_index('ix_venue_lower_name', 'venue', [sa.text('lower(name)')], unique=True)
+    op.create_index('ix_artist_lower_name', 'artist', [sa.text('lower(name)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_artist_lower_name', table_name='artist')
+    op.drop_index('ix_venue_lower_name', table_name='venue')
@@ -0,0 +1,31 @@
+"""trigram indexes for venue and artist name search
+
+Revision ID: 9a3e6d41c07b
+Revises: 5c1f0e7b2a94
+Create Date: 2020-03-15 10:21:44.106233
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e6d41c07b'
+down_revision = '5c1f0e7b2a94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
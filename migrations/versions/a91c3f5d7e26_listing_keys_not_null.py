@@ -0,0 +1,56 @@
+"""listing keys not null
+
+Revision ID: a91c3f5d7e26
+Revises: e2b7a4c9d815
+Create Date: 2020-03-22 10:05:41.508213
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c3f5d7e26'
+down_revision = 'e2b7a4c9d815'
+branch_labels = None
+depends_on = None
+
+
+logger = logging.getLogger('alembic.env')
+
+# Table: columns the listings are ordered and paged by. A NULL key compares
+# as unknown, so the pages after it were out of reach.
+KEYS = (('venue', ('name', 'city', 'state')), ('artist', ('name',)))
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, columns in KEYS:
+        # Names are unique, each one missing is named after its row.
+        for id, in bind.execute(sa.text('SELECT id FROM {} WHERE name IS NULL'.format(table))):
+            logger.warning('Naming %s %s, which had no name, %r', table, id,
+                           '{} {}'.format(table.capitalize(), id))
+        op.execute("UPDATE {0} SET name = '{1} ' || id WHERE name IS NULL".format(
+            table, table.capitalize()))
+        for column in columns[1:]:
+            op.execute("UPDATE {0} SET {1} = '' WHERE {1} IS NULL".format(table, column))
+
+        # SQLite rebuilds the table, without the expression index.
+        op.drop_index('ix_{}_lower_name'.format(table), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('name', existing_type=sa.String(), nullable=False)
+            for column in columns[1:]:
+                batch_op.alter_column(column, existing_type=sa.String(length=120), nullable=False)
+        op.create_index('ix_{}_lower_name'.format(table), table, [sa.text('lower(name)')], unique=True)
+
+
+def downgrade():
+    for table, columns in reversed(KEYS):
+        op.drop_index('ix_{}_lower_name'.format(table), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('name', existing_type=sa.String(), nullable=True)
+            for column in columns[1:]:
+                batch_op.alter_column(column, existing_type=sa.String(length=120), nullable=True)
+        op.create_index('ix_{}_lower_name'.format(table), table, [sa.text('lower(name)')], unique=True)
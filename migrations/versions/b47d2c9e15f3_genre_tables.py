@@ -0,0 +1,105 @@
+"""normalized genre tables
+
+Revision ID: b47d2c9e15f3
+Revises: 9a3e6d41c07b
+Create Date: 2020-03-16 18:40:12.583021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47d2c9e15f3'
+down_revision = '9a3e6d41c07b'
+branch_labels = None
+depends_on = None
+
+
+genre = sa.table('genre',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String))
+
+
+def split_genres(value):
+    names = [name.strip() for name in (value or '').split(',')]
+    names = [name for name in names if name]
+    # create_artist_submission used to join the characters of a single
+    # genre ("J, a, z, z"), glue those back together.
+    if len(names) > 1 and all(len(name) == 1 for name in names):
+        names = [''.join(names)]
+    return list(dict.fromkeys(names))
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genre_genre_id_venue_id', 'venue_genre', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('artist_genre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genre_genre_id_artist_id', 'artist_genre', ['genre_id', 'artist_id'], unique=False)
+
+    # Backfill the association tables from the comma separated columns.
+    connection = op.get_bind()
+    owners = {}
+    for owner in ('venue', 'artist'):
+        owners[owner] = [
+            (id, split_genres(value))
+            for id, value in connection.execute(sa.text(f'SELECT id, genres FROM {owner}'))]
+
+    names = sorted({name for rows in owners.values() for _, genres in rows for name in genres})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict((name, id) for id, name in connection.execute(sa.text('SELECT id, name FROM genre')))
+
+    for owner, rows in owners.items():
+        association = [{f'{owner}_id': id, 'genre_id': genre_ids[name]}
+                       for id, genres in rows for name in genres]
+        if association:
+            op.bulk_insert(sa.table(f'{owner}_genre',
+                                    sa.column(f'{owner}_id', sa.Integer),
+                                    sa.column('genre_id', sa.Integer)), association)
+
+    with op.batch_alter_table('venue') as batch_op:
+        batch_op.drop_column('genres')
+    with op.batch_alter_table('artist') as batch_op:
+        batch_op.drop_column('genres')
+
+
+def downgrade():
+    op.add_column('artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('venue', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    connection = op.get_bind()
+    for owner, association in (('venue', 'venue_genre'), ('artist', 'artist_genre')):
+        genres = {}
+        for id, name in connection.execute(sa.text(
+                f'SELECT {association}.{owner}_id, genre.name FROM {association} '
+                f'JOIN genre ON genre.id = {association}.genre_id ORDER BY genre.name')):
+            genres.setdefault(id, []).append(name)
+        for id, names in genres.items():
+            connection.execute(
+                sa.text(f'UPDATE {owner} SET genres = :genres WHERE id = :id'),
+                {'genres': ', '.join(names)[:120], 'id': id})
+
+    op.drop_index('ix_artist_genre_genre_id_artist_id', table_name='artist_genre')
+    op.drop_table('artist_genre')
+    op.drop_index('ix_venue_genre_genre_id_venue_id', table_name='venue_genre')
+    op.drop_table('venue_genre')
+    op.drop_table('genre')
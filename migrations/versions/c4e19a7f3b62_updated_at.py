@@ -0,0 +1,41 @@
+"""updated_at on venues, artists and shows
+
+Revision ID: c4e19a7f3b62
+Revises: 6f2d8b4a9c13
+Create Date: 2020-03-19 18:05:41.730925
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e19a7f3b62'
+down_revision = '6f2d8b4a9c13'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist', 'show')
+
+
+def upgrade():
+    # Existing rows are stamped with the time of the migration. SQLite
+    # cannot add a column defaulting to CURRENT_TIMESTAMP, so the default is
+    # a constant, dropped again where the backend allows it; the app always
+    # sets the column itself.
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=str(now)))
+        if op.get_bind().dialect.name != 'sqlite':
+            op.alter_column(table, 'updated_at', server_default=None)
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
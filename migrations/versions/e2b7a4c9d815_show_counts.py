@@ -0,0 +1,58 @@
+"""upcoming and past show counts on venues and artists
+
+Revision ID: e2b7a4c9d815
+Revises: c4e19a7f3b62
+Create Date: 2020-03-21 11:42:08.314590
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7a4c9d815'
+down_revision = 'c4e19a7f3b62'
+branch_labels = None
+depends_on = None
+
+
+OWNERS = (('venue', 'venue_id'), ('artist', 'artist_id'))
+
+
+def upgrade():
+    for table, _ in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+
+    rollover = op.create_table('show_count_rollover',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Count the existing shows as of now, which is when the first rollover
+    # starts from.
+    now = datetime.datetime.utcnow()
+    show = sa.table('show', sa.column('id'), sa.column('time'),
+                    sa.column('venue_id'), sa.column('artist_id'))
+    for name, column in OWNERS:
+        owner = sa.table(name, sa.column('id'), sa.column('upcoming_shows_count'),
+                         sa.column('past_shows_count'))
+
+        def count(condition):
+            return sa.select(sa.func.count(show.c.id)).where(
+                show.c[column] == owner.c.id, condition).scalar_subquery()
+        op.execute(owner.update().values(upcoming_shows_count=count(show.c.time > now),
+                                         past_shows_count=count(show.c.time <= now)))
+    op.bulk_insert(rollover, [{'id': 1, 'rolled_over_at': now}])
+
+
+def downgrade():
+    op.drop_table('show_count_rollover')
+    for table, _ in reversed(OWNERS):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import json
+
+import dateutil.parser
+from flask import abort, current_app, request
+from sqlalchemy import DateTime, tuple_
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value
+              for value in values]
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def cursor_value(column, value):
+    """Turn ``value`` from a cursor back into a value of ``column``, or
+    answer 400 if it cannot be one."""
+    if isinstance(column.type, DateTime):
+        # Timestamps travel as ISO strings.
+        if not isinstance(value, str):
+            abort(400)
+        try:
+            return dateutil.parser.parse(value)
+        except (ValueError, TypeError, OverflowError):
+            abort(400)
+    # The keys are NOT NULL, and a bool is not an int here.
+    if type(value) is not column.type.python_type:
+        abort(400)
+    return value
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        abort(400)
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        abort(400)
+
+    return [cursor_value(column, value) for column, value in zip(columns, values)]
+
+
+def page_size(default=None, maximum=None):
+    default = default or current_app.config['PAGE_SIZE']
+    maximum = maximum or current_app.config['MAX_PAGE_SIZE']
+    size = request.args.get('limit', type=int) or default
+    return max(1, min(size, maximum))
+
+
+def keyset_query(query, columns, after=None):
+    """Order ``query`` by ``columns`` and start it strictly after the row
+    encoded in the ``after`` cursor."""
+    if after:
+        query = query.filter(
+            tuple_(*columns) > tuple(decode_cursor(after, columns)))
+    return query.order_by(*columns)
+
+
+def keyset_page(query, columns, after=None, limit=None):
+    """Return one page of ``query`` ordered by ``columns`` and the cursor of
+    the next page (``None`` on the last page).
+
+    The page starts strictly after the row encoded in ``after``, so every
+    page is a range scan on the ordering keys instead of an OFFSET.
+    """
+    limit = limit or page_size()
+    items = keyset_query(query, columns, after).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(
+            [getattr(items[-1], column.key) for column in columns])
+
+    return items, next_cursor
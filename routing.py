@@ -0,0 +1,128 @@
+import functools
+import os
+import time
+import weakref
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+
+
+# Plain cookie rather than the session: forging it only sends the client's
+# own reads to the primary.
+STICKY_COOKIE = 'db_primary_until'
+
+
+# Engines made by RoutingSQLAlchemy. A forked worker must not use the
+# connections pooled by its parent, which the parent (or a sibling) still
+# talks over.
+_engines = weakref.WeakSet()
+
+
+def _discard_inherited_pools():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_discard_inherited_pools)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def driver_options(sa_url, options, statement_timeout=0):
+    """Adapt the engine ``options`` to the driver of ``sa_url``."""
+    options = dict(options)
+    if sa_url.drivername.startswith('sqlite'):
+        # SQLite gets a null or static pool, which take no sizes.
+        for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(option, None)
+    elif sa_url.drivername.startswith('postgres') and statement_timeout:
+        connect_args = dict(options.get('connect_args', {}))
+        if sa_url.drivername.endswith('asyncpg'):
+            connect_args['server_settings'] = dict(connect_args.get('server_settings', {}),
+                                                   statement_timeout=str(statement_timeout))
+        else:
+            connect_args['options'] = '{} -c statement_timeout={:d}'.format(
+                connect_args.get('options', ''), statement_timeout).strip()
+        options['connect_args'] = connect_args
+    return options
+
+
+def pinned_to_primary():
+    """Whether the client of the current request wrote recently."""
+    return _float(request.cookies.get(STICKY_COOKIE)) >= time.time()
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends the reads of replica views to the ``replica`` bind.
+
+    Everything else goes to the primary: writes (flushes and Core DML),
+    every statement of a view that is not marked for the replica, and the
+    rest of a request once it has written something.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if getattr(clause, 'is_dml', False) or self._flushing:
+            if has_request_context():
+                g.db_wrote = True
+        elif self._use_replica():
+            return get_state(self.app).db.get_engine(self.app, bind='replica')
+        return SignallingSession.get_bind(self, mapper, clause)
+
+    def _use_replica(self):
+        return (has_request_context()
+                and g.get('db_replica', False)
+                and not g.get('db_wrote', False)
+                and 'replica' in (self.app.config['SQLALCHEMY_BINDS'] or {}))
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """``SQLAlchemy`` with pool settings per driver and primary/replica routing.
+
+    A request that writes pins the client to the primary for
+    ``SQLALCHEMY_REPLICA_STICKY_SECONDS``, through a cookie holding the end
+    of that window, so it reads its own writes even while the replica lags.
+    ``SQLALCHEMY_STATEMENT_TIMEOUT`` (ms, ``0`` for none) is applied on
+    Postgres connections.
+
+    Engines are made on first use, and a forked process starts with empty
+    pools, so every worker opens its own connections.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('SQLALCHEMY_STATEMENT_TIMEOUT', 0)
+        super(RoutingSQLAlchemy, self).init_app(app)
+        app.after_request(self._remember_writes)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine_opts = driver_options(sa_url, engine_opts,
+                                     self.get_app().config['SQLALCHEMY_STATEMENT_TIMEOUT'])
+        engine = super(RoutingSQLAlchemy, self).create_engine(sa_url, engine_opts)
+        _engines.add(engine)
+        return engine
+
+    def reads_from_replica(self, view):
+        """Decorate a read-only view so its queries may use the replica."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.db_replica = not pinned_to_primary()
+            return view(*args, **kwargs)
+        return wrapper
+
+    def _remember_writes(self, response):
+        app = self.get_app()
+        if g.get('db_wrote', False) and 'replica' in (app.config['SQLALCHEMY_BINDS'] or {}):
+            seconds = app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, '{:.3f}'.format(time.time() + seconds),
+                                max_age=seconds, httponly=True)
+        return response
@@ -0,0 +1,348 @@
+import bisect
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+
+
+def normalize(name):
+    return ' '.join((name or '').lower().split())
+
+
+def fold(name):
+    """``normalize`` without case or accents, so 'Cafe' completes 'Café'."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(term_grams, name):
+    name_grams = trigrams(name)
+    union = term_grams | name_grams
+    if not union:
+        return 0.0
+    return len(term_grams & name_grams) / len(union)
+
+
+def table_version(session, model):
+    """Row count and newest ``updated_at`` of the table of ``model``: every
+    write, from any process, changes one or the other."""
+    return tuple(session.execute(select(func.count(), func.max(model.updated_at)).select_from(
+        model.__table__)).one())
+
+
+class TableIndex(object):
+    """Base of the in-process indexes over a table.
+
+    Writes of the process follow the model's events, but other workers and
+    scripts (``flask import-data``) write too. At most every ``check``
+    seconds, a lookup compares ``table_version`` with what it was when the
+    index was loaded, and loads the index again if the table changed.
+    """
+
+    def __init__(self, model, check=5):
+        self.model = model
+        self.check = check
+        self._version = None
+        self._checked_at = 0
+
+    def _loaded_version(self, session):
+        """Take the version before reading the rows: a write in between
+        makes the next check load them again."""
+        self._checked_at = time.monotonic()
+        return table_version(session, self.model)
+
+    def _changed(self, session):
+        now = time.monotonic()
+        if now < self._checked_at + self.check:
+            return False
+        self._checked_at = now
+        return table_version(session, self.model) != self._version
+
+
+class NameIndex(TableIndex):
+    """In-process trigram inverted index over the ``name`` column of a model.
+
+    It is loaded from the database on first use, kept current from the
+    model's insert/update/delete mapper events, and loaded again when
+    another process changed the table (see ``TableIndex``). Ids are only
+    candidates: callers re-read the rows from the database, so entries left
+    behind by a rolled back write simply drop out of the results.
+    """
+
+    def __init__(self, model, check=5):
+        super(NameIndex, self).__init__(model, check)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._names = {}
+        self._postings = defaultdict(set)
+
+        event.listen(model, 'after_insert', self._on_write)
+        event.listen(model, 'after_update', self._on_write)
+        event.listen(model, 'after_delete', self._on_delete)
+
+    def load(self, session):
+        version = self._loaded_version(session)
+        rows = session.query(self.model.id, self.model.name).all()
+        with self._lock:
+            self._names = {}
+            self._postings = defaultdict(set)
+            for id, name in rows:
+                self._add(id, name)
+            self._version = version
+            self._loaded = True
+
+    def clear(self):
+        with self._lock:
+            self._names = {}
+            self._postings = defaultdict(set)
+            self._loaded = False
+
+    def search(self, session, term, limit):
+        """Return up to ``limit`` ids whose name contains ``term``, best
+        trigram similarity first."""
+        if not self._loaded or self._changed(session):
+            self.load(session)
+
+        term = normalize(term)
+        term_grams = trigrams(term)
+
+        with self._lock:
+            if term_grams:
+                postings = sorted((self._postings.get(gram, set()) for gram in term_grams), key=len)
+                candidates = set.intersection(*postings)
+            else:
+                candidates = self._names.keys()
+            matches = [(id, self._names[id]) for id in candidates
+                       if term in self._names[id]]
+
+        matches.sort(key=lambda match: (-similarity(term_grams, match[1]), match[1], match[0]))
+        return [id for id, _ in matches[:limit]]
+
+    def _add(self, id, name):
+        name = normalize(name)
+        self._names[id] = name
+        for gram in trigrams(name):
+            self._postings[gram].add(id)
+
+    def _remove(self, id):
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        for gram in trigrams(name):
+            self._postings[gram].discard(id)
+
+    def update(self, id, name):
+        """Index ``name`` under ``id``, for rows written without the ORM."""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(id)
+            self._add(id, name)
+
+    def _on_write(self, mapper, connection, target):
+        self.update(target.id, target.name)
+
+    def _on_delete(self, mapper, connection, target):
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(target.id)
+
+
+class PrefixIndex(TableIndex):
+    """In-process prefix index over the ``name`` column of a model, for
+    autocompletion.
+
+    Two sorted arrays of ``(key, id)`` are searched by bisection: the folded
+    names, and the folded names from each later word on, so 'pet' finds
+    'Guns N Petals' after the names starting with it. A lookup costs a few
+    microseconds whatever the size of the table.
+
+    The index is built from the database on first use (or at startup, see
+    ``AUTOCOMPLETE_PRELOAD``), giving up after ``timeout`` seconds; until it
+    is built, and for ``retry`` seconds after a load that gave up, prefixes
+    are looked up in the database instead. Once built, it follows the
+    model's ORM writes when their transaction commits, rows inserted
+    without the ORM are added with ``update()``, and it is built again when
+    another process changed the table (see ``TableIndex``), the old one
+    answering until the new one is ready.
+    """
+
+    def __init__(self, model, retry=60, check=5):
+        super(PrefixIndex, self).__init__(model, check)
+        self.retry = retry
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._retry_at = 0
+        self._clear()
+
+        event.listen(model, 'after_insert', self._on_write)
+        event.listen(model, 'after_update', self._on_write)
+        event.listen(model, 'after_delete', self._on_delete)
+        event.listen(Session, 'after_commit', self._on_commit)
+        event.listen(Session, 'after_transaction_end', self._on_transaction_end)
+
+    def _clear(self):
+        self._entries = {}
+        self._names = []
+        self._words = []
+
+    def load(self, session, timeout=None):
+        """Build the index from the database, in at most ``timeout``
+        seconds. Returns whether it was built."""
+        deadline = time.monotonic() + timeout if timeout else None
+        version = self._loaded_version(session)
+        entries = {}
+        result = session.execute(select(self.model.id, self.model.name).execution_options(
+            stream_results=True)).yield_per(1000)
+        for count, (id, name) in enumerate(result, 1):
+            entries[id] = (name, self._keys(name))
+            if deadline is not None and count % 1000 == 0 and time.monotonic() > deadline:
+                result.close()
+                self._retry_at = time.monotonic() + self.retry
+                return False
+
+        names = sorted((keys[0], id) for id, (_, keys) in entries.items() if keys)
+        words = sorted((key, id) for id, (_, keys) in entries.items() for key in keys[1:])
+        with self._lock:
+            self._entries, self._names, self._words = entries, names, words
+            self._version = version
+            self._loaded = True
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self._loaded = False
+
+    def complete(self, session, prefix, limit, timeout=None):
+        """Return up to ``limit`` ``(id, name)`` whose name or one of its
+        words starts with ``prefix``, names first, each in key order."""
+        prefix = fold(prefix)
+        if not prefix or limit <= 0:
+            return []
+        if self._loaded and self._changed(session):
+            self.load(session, timeout)
+        if not self._loaded and time.monotonic() >= self._retry_at:
+            self.load(session, timeout)
+        if not self._loaded:
+            return self._complete_from_database(session, prefix, limit)
+
+        matches = []
+        with self._lock:
+            for keys in (self._names, self._words):
+                position = bisect.bisect_left(keys, (prefix,))
+                while position < len(keys) and len(matches) < limit:
+                    key, id = keys[position]
+                    if not key.startswith(prefix):
+                        break
+                    if id not in matches:
+                        matches.append(id)
+                    position += 1
+            return [(id, self._entries[id][0]) for id in matches]
+
+    def _complete_from_database(self, session, prefix, limit):
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return [tuple(row) for row in session.query(self.model.id, self.model.name).filter(
+            func.lower(self.model.name).like(pattern, escape='\\')).order_by(
+            func.lower(self.model.name), self.model.id).limit(limit)]
+
+    @staticmethod
+    def _keys(name):
+        """The folded name, then the folded name from each later word on."""
+        words = fold(name).split(' ')
+        if words == ['']:
+            return ()
+        return tuple(' '.join(words[i:]) for i in range(len(words)))
+
+    def _insert(self, id, name):
+        keys = self._keys(name)
+        self._entries[id] = (name, keys)
+        if keys:
+            bisect.insort(self._names, (keys[0], id))
+        for key in keys[1:]:
+            bisect.insort(self._words, (key, id))
+
+    def _remove(self, id):
+        name, keys = self._entries.pop(id, (None, ()))
+        for array, removed in ((self._names, keys[:1]), (self._words, keys[1:])):
+            for key in removed:
+                position = bisect.bisect_left(array, (key, id))
+                if position < len(array) and array[position] == (key, id):
+                    del array[position]
+
+    def update(self, id, name):
+        """Index ``name`` under ``id``, for rows written without the ORM,
+        once committed."""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(id)
+            self._insert(id, name)
+
+    def remove(self, id):
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(id)
+
+    # ORM writes wait in the session for its transaction to commit.
+
+    def _pending(self, target):
+        session = object_session(target)
+        return session.info.setdefault(('prefix_index', self.model), []) if session else []
+
+    def _on_write(self, mapper, connection, target):
+        if self._loaded:
+            self._pending(target).append((target.id, target.name))
+
+    def _on_delete(self, mapper, connection, target):
+        if self._loaded:
+            self._pending(target).append((target.id, None))
+
+    def _on_commit(self, session):
+        if session.in_nested_transaction():
+            return
+        for id, name in session.info.pop(('prefix_index', self.model), ()):
+            if name is None:
+                self.remove(id)
+            else:
+                self.update(id, name)
+
+    def _on_transaction_end(self, session, transaction):
+        # Committed writes are applied by then, the others are dropped.
+        if transaction.parent is None:
+            session.info.pop(('prefix_index', self.model), None)
+
+
+def search_by_name(query, model, term, index, limit):
+    """Run a bounded, ranked name search for ``model`` and return the rows
+    of ``query`` that match.
+
+    On Postgres the substring match is answered by the trigram GIN index on
+    ``name`` and ranked by trigram distance. Other databases go through the
+    in-process ``index`` and fetch the matching rows with a single ``IN``.
+    """
+    term = term or ''
+
+    if query.session.get_bind().dialect.name == 'postgresql':
+        pattern = '%{}%'.format(
+            term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+        # ``<->`` is the pg_trgm distance, so the closest names come first.
+        return query.filter(model.name.ilike(pattern, escape='\\')).order_by(
+            model.name.op('<->')(term), model.name, model.id).limit(limit).all()
+
+    ids = index.search(query.session, term, limit)
+    if not ids:
+        return []
+
+    rank = {id: position for position, id in enumerate(ids)}
+    rows = query.filter(model.id.in_(ids)).all()
+    return sorted(rows, key=lambda row: rank[row.id])
@@ -2,3 +2,36 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Name suggestions for the navbar search boxes, fetched once typing pauses.
+document.addEventListener('DOMContentLoaded', function () {
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var url = input.form.getAttribute('data-autocomplete-url');
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer;
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      var prefix = input.value.trim();
+      if (!prefix) {
+        return;
+      }
+      timer = setTimeout(function () {
+        var request = new XMLHttpRequest();
+        request.open('GET', url + '?q=' + encodeURIComponent(prefix));
+        request.onload = function () {
+          if (request.status !== 200 || input.value.trim() !== prefix) {
+            return;
+          }
+          list.innerHTML = '';
+          JSON.parse(request.responseText)[input.getAttribute('data-autocomplete')].forEach(function (match) {
+            var option = document.createElement('option');
+            option.value = match.name;
+            list.appendChild(option);
+          });
+        };
+        request.send();
+      }, 150);
+    });
+  });
+});
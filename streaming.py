@@ -0,0 +1,143 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+
+from flask import Response, current_app, stream_with_context
+
+from pagination import encode_cursor
+
+
+class JSONPageWriter(object):
+    """Writes one keyset page as ``{"data": [...], "next_cursor": ...}`` a
+    row at a time, from ``limit + 1`` rows ordered by ``columns``.
+
+    The cursor of the next page is only known once the page has been read,
+    which is why it comes after the data.
+    """
+
+    def __init__(self, columns, serialize, limit):
+        self.columns = columns
+        self.serialize = serialize
+        self.limit = limit
+        self.position = 0
+        self.last = None
+        self.next_cursor = None
+
+    def start(self):
+        return '{"data":['
+
+    def row(self, row):
+        position = self.position
+        self.position += 1
+        if position == self.limit:
+            # The extra row only tells us there is another page.
+            self.next_cursor = encode_cursor([getattr(self.last, column.key)
+                                              for column in self.columns])
+            return ''
+        self.last = row
+        return (',' if position else '') + json.dumps(self.serialize(row), separators=(',', ':'))
+
+    def end(self):
+        return '],"next_cursor":' + json.dumps(self.next_cursor) + '}'
+
+
+def stream_json_page(session, statement, columns, serialize, limit):
+    """Stream up to ``limit`` rows of the keyset ordered ``statement`` as
+    ``{"data": [...], "next_cursor": ...}``.
+
+    Rows are fetched ``API_YIELD_PER`` at a time from a server-side cursor
+    and written out as they arrive, so memory does not grow with the page
+    size.
+    """
+    rows = session.execute(statement.limit(limit + 1).execution_options(
+        stream_results=True)).yield_per(current_app.config['API_YIELD_PER'])
+    writer = JSONPageWriter(columns, serialize, limit)
+
+    def generate():
+        yield writer.start()
+        for row in rows:
+            yield writer.row(row)
+        yield writer.end()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _json(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows, columns):
+    """Yield a header line and then one CSV line per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(columns)
+    for row in rows:
+        yield line([_text(value) for value in row])
+
+
+def ndjson_lines(rows, columns):
+    """Yield one JSON object per row, newline terminated."""
+    for row in rows:
+        yield json.dumps({column: _json(value) for column, value in zip(columns, row)},
+                         separators=(',', ':')) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
+
+
+def export_chunks(query, columns, format, compress=False):
+    """Encode the rows of ``query`` as ``format`` and yield them as byte
+    chunks of about ``EXPORT_CHUNK_SIZE``, gzip compressed if asked.
+
+    ``query`` should already use ``yield_per`` so the rows come from a
+    server-side cursor; nothing here holds more than one chunk, so memory
+    stays flat whatever the size of the table.
+    """
+    lines, _ = EXPORT_FORMATS[format]
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    pending = []
+    size = 0
+    for line in lines(query, columns):
+        pending.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            data = emit(''.join(pending).encode('utf-8'))
+            pending, size = [], 0
+            if data:
+                yield data
+
+    data = emit(''.join(pending).encode('utf-8'))
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
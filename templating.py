@@ -0,0 +1,59 @@
+"""Precompiled templates.
+
+Jinja compiles each template to Python source, then to bytecode, the first
+time a process renders it, which puts the cost of every template on the
+first request of every worker. With ``TEMPLATE_CACHE_DIR`` set, the
+bytecode is kept in that folder: ``flask compile-templates`` fills it at
+build time and processes load from it instead of compiling. An entry is
+keyed by the absolute path of the template and checked against its
+source, so a stale one is recompiled rather than used, and the cache is
+best built at the path the app is deployed to.
+
+``TEMPLATE_PRELOAD`` also loads every template when the app starts, from
+the cache when there is one, so that no request waits for it.
+"""
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class TemplateCache(object):
+
+    def __init__(self, app=None):
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TEMPLATE_CACHE_DIR', None)
+        app.config.setdefault('TEMPLATE_PRELOAD', False)
+
+        self.app = app
+        self.directory = app.config['TEMPLATE_CACHE_DIR']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(self.directory)
+
+        app.extensions['template_cache'] = self
+
+    def names(self):
+        return self.app.jinja_env.list_templates(extensions=('html',))
+
+    def preload(self):
+        """Load every template into the environment, and return their
+        names. Call it once the filters and globals are registered."""
+        names = self.names()
+        for name in names:
+            self.app.jinja_env.get_template(name)
+        return names
+
+    def compile(self):
+        """Write the bytecode of every template to the cache, and return
+        their names."""
+        if not self.directory:
+            raise RuntimeError('TEMPLATE_CACHE_DIR is not set.')
+        self.app.jinja_env.bytecode_cache.clear()
+        # Loaded templates are not compiled again, nor written.
+        if self.app.jinja_env.cache is not None:
+            self.app.jinja_env.cache.clear()
+        return self.preload()
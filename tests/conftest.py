@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+import app as fyyur
+from app import create_app, db, Artist, Show, Venue
+
+
+def make_app(tmp_path, **config):
+    """An app on an SQLite file of ``tmp_path``, with the page cache off."""
+    settings = {
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///{}'.format(tmp_path / 'fyyur.db'),
+        'SQLALCHEMY_BINDS': {},
+        'CACHE_TYPE': 'null',
+        'LOG_FILE': None,
+        'WTF_CSRF_ENABLED': False,
+    }
+    settings.update(config)
+    app = create_app(settings)
+    # The name indexes are held by the module, and were loaded from the
+    # database of another test.
+    for index in (fyyur.venue_names, fyyur.artist_names,
+                  fyyur.venue_prefixes, fyyur.artist_prefixes):
+        index.clear()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.get_engine(app).dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_shows(venue_id, artist_id, count):
+    """Add ``count`` shows of the artist at the venue, half of them past."""
+    now = datetime.datetime.utcnow()
+    db.session.add_all(Show(venue_id=venue_id, artist_id=artist_id,
+                            time=now + datetime.timedelta(days=day if day % 2 else -day))
+                       for day in range(1, count + 1))
+
+
+def add_venue_and_artist(name='Test'):
+    venue = Venue(name=name + ' Venue', city='San Francisco', state='CA')
+    artist = Artist(name=name + ' Artist', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    return venue, artist
@@ -0,0 +1,21 @@
+"""create_app never signs sessions with a key anyone knows."""
+import logging
+
+from conftest import make_app
+
+
+def test_tests_get_a_fixed_key(tmp_path):
+    assert make_app(tmp_path, SECRET_KEY=None).config['SECRET_KEY'] == 'dev'
+
+
+def test_a_missing_key_is_made_up_per_process(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        first = make_app(tmp_path, SECRET_KEY=None, TESTING=False, DEBUG=False)
+        second = make_app(tmp_path, SECRET_KEY=None, TESTING=False, DEBUG=False)
+    assert len(first.config['SECRET_KEY']) == 32
+    assert first.config['SECRET_KEY'] != second.config['SECRET_KEY']
+    assert 'SECRET_KEY is not set' in caplog.text
+
+
+def test_a_set_key_is_kept(tmp_path):
+    assert make_app(tmp_path, TESTING=False).config['SECRET_KEY'] == 'test'
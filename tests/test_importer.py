@@ -0,0 +1,71 @@
+"""flask import-data loads what it can read and reports every other line."""
+import pytest
+
+from app import db, Artist, Show, Venue
+
+
+@pytest.fixture
+def run_import(app, tmp_path):
+    def run_import(option, name, text):
+        path = tmp_path / name
+        path.write_text(text, encoding='utf-8')
+        return app.test_cli_runner().invoke(args=['import-data', option, str(path)])
+    return run_import
+
+
+def names(app, model):
+    with app.app_context():
+        return sorted(name for name, in db.session.query(model.name))
+
+
+def test_csv_reports_bad_records_and_loads_the_others(app, run_import):
+    result = run_import('--venues', 'venues.csv', '\n'.join([
+        'name,city,state,genres',
+        'Blue Hop,San Francisco,CA,"Jazz,Blues"',
+        ',San Francisco,CA,',
+        'blue hop,Oakland,CA,',
+        'Park Square,,,',
+    ]) + '\n')
+    assert result.exit_code == 0, result.output
+    assert 'venues: 2 inserted, 1 duplicates skipped, 1 errors' in result.output
+    assert 'line 3: missing name' in result.output
+    assert names(app, Venue) == ['Blue Hop', 'Park Square']
+
+
+def test_csv_shows_report_unknown_owners_and_bad_times(app, run_import):
+    run_import('--venues', 'venues.csv', 'name\nBlue Hop\n')
+    run_import('--artists', 'artists.csv', 'name\nGuns N Petals\n')
+    result = run_import('--shows', 'shows.csv', '\n'.join([
+        'venue,artist,start_time',
+        'Blue Hop,Guns N Petals,2035-04-01T20:00:00',
+        'Nowhere,Guns N Petals,2035-04-01T20:00:00',
+        'Blue Hop,Nobody,2035-04-01T20:00:00',
+        'Blue Hop,Guns N Petals,someday',
+    ]) + '\n')
+    assert result.exit_code == 0, result.output
+    assert 'shows: 1 inserted, 0 duplicates skipped, 3 errors' in result.output
+    for error in ('line 3: unknown venue', 'line 4: unknown artist', 'line 5: invalid start_time'):
+        assert error in result.output
+    with app.app_context():
+        assert Show.query.count() == 1
+
+
+def test_ndjson_reports_unreadable_lines_and_loads_the_others(app, run_import):
+    result = run_import('--artists', 'artists.ndjson', '\n'.join([
+        '{"name": "Guns N Petals", "genres": ["Rock n Roll"]}',
+        '{"name": "Matt Quevedo"',
+        '',
+        '[1]',
+        '"The Wild Sax Band"',
+        '{"name": 5}',
+        '{"name": "The Wild Sax Band", "city": "San Francisco"}',
+    ]) + '\n')
+    assert result.exit_code == 0, result.output
+    assert 'artists: 2 inserted, 0 duplicates skipped, 4 errors' in result.output
+    assert [line for line in result.output.splitlines() if line.startswith('  line')] == [
+        '  line 2: invalid JSON',
+        '  line 4: not a JSON object',
+        '  line 5: not a JSON object',
+        '  line 6: invalid name',
+    ]
+    assert names(app, Artist) == ['Guns N Petals', 'The Wild Sax Band']
@@ -0,0 +1,45 @@
+"""Listings page by cursors, and answer 400 to one they did not make."""
+import pytest
+
+from app import db
+from conftest import add_shows, add_venue_and_artist
+from pagination import encode_cursor
+
+
+@pytest.fixture
+def shows(app):
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        add_shows(venue.id, artist.id, 3)
+        db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/shows', '/api/v1/shows'])
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    encode_cursor(['2020-01-01T20:00:00']),
+    encode_cursor(['not a date', 1]),
+    encode_cursor(['9999999999999999999999', 1]),
+    encode_cursor([5, 1]),
+    encode_cursor([None, 1]),
+    encode_cursor(['2020-01-01T20:00:00', 'one']),
+    encode_cursor(['2020-01-01T20:00:00', True]),
+    encode_cursor({'time': '2020-01-01T20:00:00'}),
+])
+def test_bad_cursor_is_a_bad_request(shows, client, url, cursor):
+    assert client.get(url, query_string={'after': cursor}).status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/venues', '/artists'])
+def test_bad_listing_cursor_is_a_bad_request(shows, client, url):
+    assert client.get(url, query_string={'after': encode_cursor([1])}).status_code == 400
+
+
+def test_cursor_pages_through_the_shows(shows, client):
+    first = client.get('/api/v1/shows', query_string={'limit': 2}).get_json()
+    assert len(first['data']) == 2
+    rest = client.get('/api/v1/shows', query_string={
+        'limit': 2, 'after': first['next_cursor']}).get_json()
+    assert len(rest['data']) == 1
+    assert rest['next_cursor'] is None
+    assert client.get('/shows', query_string={'after': first['next_cursor']}).status_code == 200
@@ -0,0 +1,58 @@
+"""Routes are held to their query budget: over it, a request logs a
+warning, or fails when SQL_QUERY_BUDGET_ACTION is 'raise'."""
+import logging
+
+import pytest
+
+from app import db
+from conftest import add_shows, add_venue_and_artist, make_app
+from instrumentation import ENVIRON_KEY, QueryBudgetExceeded
+
+
+def budget_app(tmp_path, budgets, action='raise'):
+    app = make_app(tmp_path, SQL_QUERY_BUDGETS=budgets, SQL_QUERY_BUDGET_ACTION=action)
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        add_shows(venue.id, artist.id, 3)
+        db.session.commit()
+    return app
+
+
+def test_routes_within_budget(tmp_path):
+    client = budget_app(tmp_path, {'venues.show_venue': 3}).test_client()
+    response = client.get('/venues/1')
+    assert response.status_code == 200
+    assert response.headers['X-DB-Query-Count'] == '3'
+
+
+def test_route_over_budget_raises(tmp_path):
+    client = budget_app(tmp_path, {'venues.show_venue': 2}).test_client()
+    with pytest.raises(QueryBudgetExceeded, match='venues.show_venue ran 3 queries'):
+        client.get('/venues/1')
+
+
+def test_route_over_budget_warns(tmp_path, caplog):
+    client = budget_app(tmp_path, {'venues.show_venue': 2}, action='warn').test_client()
+    with caplog.at_level(logging.WARNING):
+        assert client.get('/venues/1').status_code == 200
+    assert 'venues.show_venue ran 3 queries, over its budget of 2' in caplog.text
+
+
+def test_streamed_response_is_counted_once_closed(tmp_path):
+    client = budget_app(tmp_path, {'main.export': 0}).test_client()
+    response = client.get('/export/venues.csv')
+    # The count is not known when the headers go out.
+    assert 'X-DB-Query-Count' not in response.headers
+    assert 'Test Venue' in response.get_data(as_text=True)
+    with pytest.raises(QueryBudgetExceeded, match='main.export ran 1 queries'):
+        response.close()
+
+
+def test_streamed_response_stats_reach_the_caller(tmp_path):
+    client = budget_app(tmp_path, {}).test_client()
+    stats = []
+    response = client.get('/export/venues.csv', buffered=False,
+                          environ_overrides={ENVIRON_KEY: stats})
+    response.get_data()
+    response.close()
+    assert stats[0].count == 1
@@ -0,0 +1,40 @@
+"""The detail pages load a venue or an artist with all of its shows in a
+fixed number of queries, however many shows there are."""
+import pytest
+
+from app import db
+from conftest import add_shows, add_venue_and_artist
+
+# The version query of the ETag, the joined load of the row with its shows
+# and their venue or artist, and the select-in load of the genres.
+DETAIL_PAGE_QUERIES = 3
+
+
+def query_count(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return int(response.headers['X-DB-Query-Count'])
+
+
+@pytest.mark.parametrize('shows', [1, 50])
+def test_detail_pages_run_a_fixed_number_of_queries(app, client, shows):
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        add_shows(venue.id, artist.id, shows)
+        db.session.commit()
+        urls = ['/venues/{}'.format(venue.id), '/artists/{}'.format(artist.id)]
+
+    for url in urls:
+        assert query_count(client, url) == DETAIL_PAGE_QUERIES, url
+
+
+def test_detail_pages_list_every_show(app, client):
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        add_shows(venue.id, artist.id, 5)
+        db.session.commit()
+        venue_id = venue.id
+
+    html = client.get('/venues/{}'.format(venue_id)).get_data(as_text=True)
+    assert '3 Upcoming' in html
+    assert '2 Past' in html
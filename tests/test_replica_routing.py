@@ -0,0 +1,63 @@
+"""Reads of the replica views go to the ``replica`` bind, writes to the
+primary, and a client that wrote reads from the primary for a while."""
+import pytest
+from sqlalchemy import orm
+
+from app import db, Venue
+from conftest import make_app
+from routing import STICKY_COOKIE
+
+
+def add_venue(session, name):
+    session.add(Venue(name=name, city='San Francisco', state='CA'))
+    session.commit()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path, SQLALCHEMY_BINDS={
+        'replica': 'sqlite:///{}'.format(tmp_path / 'replica.db')})
+    with app.app_context():
+        replica = db.get_engine(app, bind='replica')
+        db.Model.metadata.create_all(replica)
+        # The same row on both, under names telling them apart.
+        add_venue(db.session, 'Primary Venue')
+        add_venue(orm.Session(bind=replica), 'Replica Venue')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.get_engine(app).dispose()
+        replica.dispose()
+
+
+def venue_names(app, bind=None):
+    with app.app_context():
+        engine = db.get_engine(app, bind=bind)
+        return {name for name, in engine.execute(Venue.__table__.select().with_only_columns(Venue.name))}
+
+
+def test_reads_go_to_the_replica(client):
+    html = client.get('/venues/1').get_data(as_text=True)
+    assert 'Replica Venue' in html
+    assert 'Primary Venue' not in html
+
+
+def test_writes_go_to_the_primary_and_pin_the_client(app, client):
+    response = client.post('/venues/create', data={
+        'name': 'New Venue', 'city': 'San Francisco', 'state': 'CA'})
+    assert 'successfully listed' in response.get_data(as_text=True)
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+    assert 'New Venue' in venue_names(app)
+    assert 'New Venue' not in venue_names(app, bind='replica')
+
+    # The test client sends the cookie back: the client reads its writes.
+    assert 'Primary Venue' in client.get('/venues/1').get_data(as_text=True)
+    # Another one still reads from the replica.
+    assert 'Replica Venue' in app.test_client().get('/venues/1').get_data(as_text=True)
+
+
+def test_reads_go_to_the_primary_without_a_replica(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        add_venue(db.session, 'Primary Venue')
+    assert 'Primary Venue' in app.test_client().get('/venues/1').get_data(as_text=True)
@@ -0,0 +1,72 @@
+"""The in-process name indexes see the rows other processes write."""
+import pytest
+import sqlalchemy
+
+import app as fyyur
+from app import db, Venue
+
+
+@pytest.fixture
+def other_process(app):
+    """An engine of its own on the database, as another worker has."""
+    engine = sqlalchemy.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def no_throttle(monkeypatch):
+    for index in (fyyur.venue_names, fyyur.venue_prefixes):
+        monkeypatch.setattr(index, 'check', 0)
+
+
+def add_venue(engine, name):
+    with engine.begin() as connection:
+        connection.execute(Venue.__table__.insert().values(
+            name=name, city='San Francisco', state='CA'))
+
+
+def completions(client, prefix):
+    response = client.get('/api/autocomplete', query_string={'q': prefix})
+    return [venue['name'] for venue in response.get_json()['venues']]
+
+
+def search(client, term):
+    html = client.post('/venues/search', data={'search_term': term}).get_data(as_text=True)
+    return {name for name in ('Blue Hop', 'Blue Lounge') if name in html}
+
+
+@pytest.fixture
+def blue_hop(app):
+    with app.app_context():
+        db.session.add(Venue(name='Blue Hop', city='San Francisco', state='CA'))
+        db.session.commit()
+
+
+def test_autocomplete_sees_rows_of_other_processes(blue_hop, client, other_process, no_throttle):
+    assert completions(client, 'Blue') == ['Blue Hop']
+    add_venue(other_process, 'Blue Lounge')
+    assert completions(client, 'Blue') == ['Blue Hop', 'Blue Lounge']
+    with other_process.begin() as connection:
+        connection.execute(Venue.__table__.delete().where(Venue.name == 'Blue Hop'))
+    assert completions(client, 'Blue') == ['Blue Lounge']
+
+
+def test_autocomplete_checks_the_table_at_most_every_few_seconds(blue_hop, client, other_process):
+    assert completions(client, 'Blue') == ['Blue Hop']
+    add_venue(other_process, 'Blue Lounge')
+    assert completions(client, 'Blue') == ['Blue Hop']
+    fyyur.venue_prefixes._checked_at -= fyyur.venue_prefixes.check
+    assert completions(client, 'Blue') == ['Blue Hop', 'Blue Lounge']
+
+
+def test_autocomplete_follows_writes_of_the_process(blue_hop, client):
+    assert completions(client, 'Blue') == ['Blue Hop']
+    client.post('/venues/create', data={'name': 'Blue Lounge', 'city': 'San Francisco', 'state': 'CA'})
+    assert completions(client, 'Blue') == ['Blue Hop', 'Blue Lounge']
+
+
+def test_search_sees_rows_of_other_processes(blue_hop, client, other_process, no_throttle):
+    assert search(client, 'blue') == {'Blue Hop'}
+    add_venue(other_process, 'Blue Lounge')
+    assert search(client, 'blue') == {'Blue Hop', 'Blue Lounge'}
@@ -0,0 +1,124 @@
+"""Batches of shows are listed all or none, with an error for each bad row,
+from the form (pasted lines or a CSV file) and from the JSON API."""
+import io
+
+import pytest
+
+import app as fyyur
+from app import db, Show
+from conftest import add_venue_and_artist
+
+
+@pytest.fixture
+def ids(app):
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        db.session.commit()
+        return venue.id, artist.id
+
+
+def show_count(app):
+    with app.app_context():
+        return Show.query.count()
+
+
+def test_form_lists_pasted_lines(app, client, ids):
+    venue_id, artist_id = ids
+    response = client.post('/shows/create/batch', data={'shows': '\n'.join([
+        '{},{},2035-04-01 20:00'.format(artist_id, venue_id),
+        '',
+        '{},{},2035-04-02T21:00:00Z'.format(artist_id, venue_id),
+    ])})
+    assert '2 shows were successfully listed!' in response.get_data(as_text=True)
+    assert show_count(app) == 2
+
+
+def test_form_lists_an_uploaded_file(app, client, ids):
+    venue_id, artist_id = ids
+    text = 'venue_id,artist_id,start_time\n{},{},2035-04-01 20:00\n'.format(venue_id, artist_id)
+    response = client.post('/shows/create/batch', data={
+        'file': (io.BytesIO(text.encode('utf-8')), 'tour.csv')})
+    assert '1 shows were successfully listed!' in response.get_data(as_text=True)
+    assert show_count(app) == 1
+
+
+def test_form_lists_errors_by_line_and_nothing_else(app, client, ids):
+    venue_id, artist_id = ids
+    html = client.post('/shows/create/batch', data={'shows': '\n'.join([
+        '{},{},2035-04-01 20:00'.format(artist_id, venue_id),
+        '{},99,2035-04-01 20:00'.format(artist_id),
+        'x,{},2035-04-01 20:00'.format(venue_id),
+        '{},{},someday'.format(artist_id, venue_id),
+        '{},{},2035-04-01 20:00'.format(artist_id, venue_id),
+    ])}).get_data(as_text=True)
+    assert 'Line 2: unknown venue 99' in html
+    assert 'Line 3: invalid artist_id' in html
+    assert 'Line 4: invalid start_time' in html
+    assert 'Line 5: same show as row 1' in html
+    assert show_count(app) == 0
+
+
+def test_api_lists_shows(app, client, ids):
+    venue_id, artist_id = ids
+    response = client.post('/api/v1/shows', json=[
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-04-01T20:00:00'},
+        {'artist_id': str(artist_id), 'venue_id': venue_id, 'start_time': '2035-04-02 20:00'},
+    ])
+    assert response.status_code == 201
+    assert response.get_json() == {'created': 2}
+    assert show_count(app) == 2
+
+
+def test_api_reports_errors_by_row(app, client, ids):
+    venue_id, artist_id = ids
+    response = client.post('/api/v1/shows', json={'shows': [
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-04-01T20:00:00'},
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': 12},
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': None},
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-13-01'},
+        {'artist_id': True, 'venue_id': venue_id, 'start_time': '2035-04-01T20:00:00'},
+        {'artist_id': 99, 'venue_id': venue_id, 'start_time': '2035-04-01T20:00:00'},
+        [artist_id, venue_id, '2035-04-01T20:00:00'],
+    ]})
+    assert response.status_code == 422
+    assert response.get_json()['errors'] == [
+        {'row': 2, 'message': 'invalid start_time'},
+        {'row': 3, 'message': 'invalid start_time'},
+        {'row': 4, 'message': 'invalid start_time'},
+        {'row': 5, 'message': 'invalid artist_id'},
+        {'row': 6, 'message': 'unknown artist 99'},
+        {'row': 7, 'message': 'invalid artist_id'},
+    ]
+    assert show_count(app) == 0
+
+
+@pytest.mark.parametrize('body', [b'not json', b'{"shows": 1}', b'"shows"'])
+def test_api_rejects_anything_but_a_list(client, body):
+    response = client.post('/api/v1/shows', data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_api_rejects_too_many_rows(app, client, ids):
+    app.config['SHOW_BATCH_MAX_ROWS'] = 2
+    venue_id, artist_id = ids
+    response = client.post('/api/v1/shows', json=[
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-04-0{}'.format(day)}
+        for day in range(1, 4)])
+    assert response.status_code == 422
+    assert response.get_json()['errors'] == [{'row': None, 'message': 'more than 2 shows'}]
+
+
+def test_api_rolls_back_a_failed_batch(app, client, ids, monkeypatch):
+    insert_shows = fyyur.insert_shows
+
+    def insert_then_fail(rows, batch_size):
+        insert_shows(rows[:1], batch_size)
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(fyyur, 'insert_shows', insert_then_fail)
+    venue_id, artist_id = ids
+    response = client.post('/api/v1/shows', json=[
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-04-0{}'.format(day)}
+        for day in range(1, 3)])
+    assert response.status_code == 500
+    assert show_count(app) == 0
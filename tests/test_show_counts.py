@@ -0,0 +1,132 @@
+"""Venues and artists store their numbers of upcoming and past shows, which
+the listings and searches read. Every write of shows keeps them exact, as
+do the rollover of started shows and verify-show-counts --repair."""
+import datetime
+
+import pytest
+
+from app import db, rollover_show_counts, show_count_mismatches, SHOW_OWNERS, Artist, Venue
+from conftest import add_venue_and_artist
+
+HOUR = datetime.timedelta(hours=1)
+
+
+@pytest.fixture
+def ids(app):
+    """A venue and an artist, and another of each."""
+    with app.app_context():
+        venue, artist = add_venue_and_artist()
+        other_venue, other_artist = add_venue_and_artist('Other')
+        db.session.commit()
+        return venue.id, artist.id, other_venue.id, other_artist.id
+
+
+def counts(app, model, id):
+    with app.app_context():
+        row = db.session.get(model, id)
+        return row.upcoming_shows_count, row.past_shows_count
+
+
+def mismatches(app, now=None):
+    with app.app_context():
+        now = now or datetime.datetime.utcnow()
+        return [tuple(row) for model, column in SHOW_OWNERS
+                for row in db.session.execute(show_count_mismatches(model, column, now))]
+
+
+def add_show(client, venue_id, artist_id, time):
+    page = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id,
+        'start_time': time.isoformat(' ')}).get_data(as_text=True)
+    assert 'Show was successfully listed!' in page
+
+
+def test_created_shows_are_counted(app, client, ids):
+    venue_id, artist_id, _, _ = ids
+    now = datetime.datetime.utcnow()
+    add_show(client, venue_id, artist_id, now + 24 * HOUR)
+    add_show(client, venue_id, artist_id, now - 24 * HOUR)
+    assert counts(app, Venue, venue_id) == (1, 1)
+    assert counts(app, Artist, artist_id) == (1, 1)
+    assert mismatches(app) == []
+
+
+def test_batches_and_imports_are_counted(app, client, ids, tmp_path):
+    venue_id, artist_id, other_venue_id, _ = ids
+    response = client.post('/api/v1/shows', json=[
+        {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2035-04-01T20:00:00'},
+        {'venue_id': other_venue_id, 'artist_id': artist_id, 'start_time': '2019-04-01T20:00:00'},
+    ])
+    assert response.status_code == 201
+    path = tmp_path / 'shows.csv'
+    path.write_text('venue_id,artist_id,start_time\n{},{},2035-04-02T20:00:00\n'.format(
+        venue_id, artist_id))
+    assert app.test_cli_runner().invoke(args=['import-data', '--shows', str(path)]).exit_code == 0
+
+    assert counts(app, Venue, venue_id) == (2, 0)
+    assert counts(app, Venue, other_venue_id) == (0, 1)
+    assert counts(app, Artist, artist_id) == (2, 1)
+    assert mismatches(app) == []
+
+
+def test_deleting_a_venue_recounts_its_artists(app, client, ids):
+    venue_id, artist_id, other_venue_id, other_artist_id = ids
+    now = datetime.datetime.utcnow()
+    add_show(client, venue_id, artist_id, now + 24 * HOUR)
+    add_show(client, venue_id, other_artist_id, now - 24 * HOUR)
+    add_show(client, other_venue_id, artist_id, now - 24 * HOUR)
+
+    client.delete('/venues/{}'.format(venue_id))
+    assert counts(app, Artist, artist_id) == (0, 1)
+    assert counts(app, Artist, other_artist_id) == (0, 0)
+    assert counts(app, Venue, other_venue_id) == (0, 1)
+    assert mismatches(app) == []
+
+
+def test_rollover_moves_started_shows_to_the_past(app, client, ids):
+    venue_id, artist_id, _, _ = ids
+    now = datetime.datetime.utcnow()
+    add_show(client, venue_id, artist_id, now + HOUR)
+    add_show(client, venue_id, artist_id, now + 2 * HOUR)
+    assert counts(app, Venue, venue_id) == (2, 0)
+
+    with app.app_context():
+        assert rollover_show_counts(now + 90 * datetime.timedelta(minutes=1)) == 2
+    assert counts(app, Venue, venue_id) == (1, 1)
+    assert counts(app, Artist, artist_id) == (1, 1)
+
+    with app.app_context():
+        # Only the rows with shows started since the last rollover.
+        assert rollover_show_counts(now + 90 * datetime.timedelta(minutes=1)) == 0
+        assert rollover_show_counts(now + 3 * HOUR) == 2
+    assert counts(app, Venue, venue_id) == (0, 2)
+    assert mismatches(app, now + 3 * HOUR) == []
+
+
+def test_verify_show_counts_finds_and_repairs_drift(app, client, ids):
+    venue_id, artist_id, _, _ = ids
+    add_show(client, venue_id, artist_id, datetime.datetime.utcnow() + 24 * HOUR)
+    with app.app_context():
+        db.session.execute(Venue.__table__.update().where(Venue.id == venue_id).values(
+            upcoming_shows_count=5, past_shows_count=2))
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['verify-show-counts'])
+    assert result.exit_code == 1
+    assert 'venue: 1 with wrong show counts' in result.output
+    assert 'venue {}: upcoming 1 (stored 5), past 0 (stored 2)'.format(venue_id) in result.output
+    assert 'artist: 0 with wrong show counts' in result.output
+
+    assert runner.invoke(args=['verify-show-counts', '--repair']).exit_code == 0
+    assert counts(app, Venue, venue_id) == (1, 0)
+    result = runner.invoke(args=['verify-show-counts'])
+    assert result.exit_code == 0
+    assert 'venue: 0 with wrong show counts' in result.output
+
+
+def test_search_shows_the_stored_counts(app, client, ids):
+    venue_id, artist_id, _, _ = ids
+    add_show(client, venue_id, artist_id, datetime.datetime.utcnow() + 24 * HOUR)
+    html = client.post('/venues/search', data={'search_term': 'Test Venue'}).get_data(as_text=True)
+    assert 'Upcoming shows: 1' in html
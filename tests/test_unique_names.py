@@ -0,0 +1,76 @@
+"""Venue and artist names are unique ignoring case. create_unique leaves
+the check to the unique index, with INSERT ... ON CONFLICT DO NOTHING or,
+without it, a savepoint that catches the IntegrityError."""
+import threading
+
+import pytest
+
+import app as fyyur
+from app import create_unique, db, get_genres, Artist, Genre, Venue
+
+
+def venue(name):
+    return {'name': name, 'city': 'San Francisco', 'state': 'CA'}
+
+
+@pytest.fixture(params=['on conflict', 'savepoint'])
+def insert_path(request, monkeypatch):
+    if request.param == 'savepoint':
+        monkeypatch.setattr(fyyur, 'insert_or_ignore', lambda table: None)
+    return request.param
+
+
+def test_same_name_ignoring_case_is_not_inserted(app, insert_path):
+    with app.app_context():
+        venue_id = create_unique(Venue, venue('Blue Hop'))
+        assert venue_id is not None
+        assert create_unique(Venue, venue('BLUE HOP')) is None
+        assert create_unique(Venue, venue('blue hop')) is None
+        # An artist may have the name of a venue.
+        assert create_unique(Artist, {'name': 'Blue Hop'}) is not None
+        db.session.commit()
+        assert [name for name, in db.session.query(Venue.name)] == ['Blue Hop']
+
+
+def test_conflict_keeps_the_rest_of_the_transaction(app, insert_path):
+    with app.app_context():
+        create_unique(Venue, venue('Blue Hop'))
+        db.session.commit()
+        venue_id = create_unique(Venue, venue('Park Square'))
+        assert create_unique(Venue, venue('blue hop')) is None
+        db.session.commit()
+        assert db.session.get(Venue, venue_id).name == 'Park Square'
+
+
+def test_new_genres_tolerate_existing_ones(app, insert_path):
+    with app.app_context():
+        db.session.add(Genre(name='Jazz'))
+        db.session.commit()
+        genres = get_genres(['Jazz', 'Blues', ' Jazz '])
+        db.session.commit()
+        assert sorted(genre.name for genre in genres) == ['Blues', 'Jazz']
+        assert Genre.query.count() == 2
+
+
+def test_concurrent_submissions_list_one_venue(app):
+    names = ['Blue Hop', 'blue hop', 'BLUE HOP', ' Blue Hop ', 'Blue hop', 'bLUE hOP']
+    start = threading.Barrier(len(names))
+    pages = {}
+
+    def submit(name):
+        client = app.test_client()
+        start.wait()
+        pages[name] = client.post('/venues/create', data=venue(name)).get_data(as_text=True)
+
+    threads = [threading.Thread(target=submit, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    listed = [name for name, page in pages.items() if 'successfully listed' in page]
+    refused = [name for name, page in pages.items() if 'already listed' in page]
+    assert len(listed) == 1
+    assert len(refused) == len(names) - 1
+    with app.app_context():
+        assert Venue.query.count() == 1